@@ -0,0 +1,63 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.dialects import sqlite
+
+
+def upsert_increment(session, model, key, increments):
+    """
+    Add `increments` to the row of `model` identified by `key`, creating it if needed
+    (INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col)
+    Args:
+        key: dict of primary-key (or unique) column -> value
+        increments: dict of numeric column -> amount to add
+    """
+    table = model.__table__
+    _upsert(session, table, key, increments,
+            lambda excluded: {col: table.c[col] + excluded[col] for col in increments},
+            {col: table.c[col] + amount for col, amount in increments.items()})
+
+
+def upsert_values(session, model, key, values):
+    """
+    Create the row of `model` identified by `key`, or overwrite `values` on it
+    (INSERT ... ON CONFLICT DO UPDATE SET col = excluded.col)
+    """
+    _upsert(session, model.__table__, key, values,
+            lambda excluded: {col: excluded[col] for col in values}, values)
+
+
+def _upsert(session, table, key, values, conflict_set, update_set):
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            insert = sqlite.insert
+        else:
+            # Chỉ nạp dialect PostgreSQL (khá nặng) khi thật sự dùng
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**key, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=conflict_set(stmt.excluded))
+        session.execute(stmt)
+        return
+    # Các CSDL khác: UPDATE trước, chưa có dòng thì INSERT
+    updated = session.execute(
+        table.update().where(*[table.c[col] == value for col, value in key.items()]).values(update_set)
+    ).rowcount
+    if not updated:
+        session.execute(table.insert().values(**key, **values))
+
+
+def parse_range(start, end, default_days=30):
+    """
+    Parse ISO date strings from query args into an inclusive (start, end) range,
+    defaulting to the last `default_days` days (UTC, like Order.created_at)
+    """
+    today = datetime.utcnow().date()
+    try:
+        end_day = date.fromisoformat(end) if end else today
+    except ValueError:
+        end_day = today
+    try:
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=default_days - 1)
+    except ValueError:
+        start_day = end_day - timedelta(days=default_days - 1)
+    return start_day, end_day
@@ -0,0 +1,196 @@
+"""
+Static asset serving: fingerprinted URLs, far-future caching, precompressed
+variants and proxy offload.
+
+AssetManifest maps every file under static/ (except uploads/) to a name that
+contains a hash of its content, e.g. style.css -> style.3f9a1c2e.css, and
+url_for('static', ...) emits the hashed name. Hashed names and content-
+addressed uploads never change, so they are served with
+Cache-Control: immutable. Compressible files get .gz (and .br when the
+brotli package is installed) siblings that are sent to clients accepting
+them. With STATIC_SENDFILE set, the actual bytes are left to the proxy in
+front (nginx X-Accel-Redirect or Apache/lighttpd X-Sendfile).
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import abort, current_app, request, send_from_directory
+
+import images
+
+try:
+    import brotli
+except ImportError:  # brotli không bắt buộc: không có thì chỉ tạo bản .gz
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+UPLOADS_DIR = 'uploads'
+_HASHED_RE = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{8})(?P<ext>\.[^./]+)$')
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()[:8]
+
+
+def _hashed_name(filename, digest):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest}{ext}'
+
+
+def precompress(path):
+    """
+    Write path.gz (and path.br) next to a compressible file when missing or stale
+    Returns:
+        list of files written
+    """
+    written = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    encoders = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for suffix, encode in encoders:
+        target = path + suffix
+        if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+            continue
+        tmp_path = f'{target}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode(data))
+        os.replace(tmp_path, target)
+        written.append(target)
+    return written
+
+
+class AssetManifest:
+    def __init__(self, static_folder, autobuild=False, compress=True):
+        """
+        Args:
+            autobuild: build() on first use instead of up front
+            compress: passed to that first build()
+        """
+        self.static_folder = static_folder
+        self.hashed = {}    # style.css -> style.3f9a1c2e.css
+        self.original = {}  # style.3f9a1c2e.css -> style.css
+        self.autobuild = autobuild
+        self.compress = compress
+        self._lock = threading.Lock()
+
+    def _ensure_built(self):
+        if self.autobuild:
+            with self._lock:
+                if self.autobuild:
+                    self.build(compress=self.compress)
+                    self.autobuild = False
+
+    def build(self, compress=True):
+        """Hash (and optionally precompress) every static file outside uploads/"""
+        hashed, original = {}, {}
+        for root, dirs, files in os.walk(self.static_folder):
+            if root == self.static_folder and UPLOADS_DIR in dirs:
+                dirs.remove(UPLOADS_DIR)
+            for name in files:
+                if name.endswith(('.gz', '.br', '.tmp')):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                if compress and name.endswith(COMPRESSIBLE):
+                    try:
+                        precompress(path)
+                    except OSError:
+                        pass  # Thư mục chỉ đọc: chạy `flask build-assets` lúc deploy
+                fingerprinted = _hashed_name(filename, _digest(path))
+                hashed[filename] = fingerprinted
+                original[fingerprinted] = filename
+        self.hashed, self.original = hashed, original
+        return self
+
+    def url_filename(self, filename):
+        self._ensure_built()
+        return self.hashed.get(filename, filename)
+
+    def resolve(self, filename):
+        """
+        Map a requested name to the file on disk
+        Returns:
+            (filename, immutable)
+        """
+        self._ensure_built()
+        if filename in self.original:
+            return self.original[filename], True
+        if filename.startswith(f'{UPLOADS_DIR}/'):
+            return filename, images.is_content_addressed(filename[len(UPLOADS_DIR) + 1:])
+        # Tên có hash nhưng là bản cũ (đã deploy bản mới): vẫn trả file hiện tại, không cache lâu
+        match = _HASHED_RE.match(filename)
+        if match and f'{match.group("stem")}{match.group("ext")}' in self.hashed:
+            return f'{match.group("stem")}{match.group("ext")}', False
+        return filename, False
+
+
+def _accepted_encoding(filename):
+    if not filename.endswith(COMPRESSIBLE):
+        return None
+    accepted = request.accept_encodings
+    folder = current_app.static_folder
+    if brotli is not None and accepted['br'] and os.path.exists(os.path.join(folder, filename + '.br')):
+        return 'br'
+    if accepted['gzip'] and os.path.exists(os.path.join(folder, filename + '.gz')):
+        return 'gzip'
+    return None
+
+
+def serve(manifest, filename):
+    """View for the 'static' endpoint"""
+    filename, immutable = manifest.resolve(filename)
+    folder = current_app.static_folder
+    path = os.path.join(folder, filename)
+    if '..' in filename.split('/') or not os.path.isfile(path):
+        abort(404)
+    max_age = IMMUTABLE_MAX_AGE if immutable else None
+    sendfile = current_app.config.get('STATIC_SENDFILE')
+
+    if sendfile == 'x-accel':
+        # nginx đọc file trực tiếp (sendfile, gzip_static) từ location internal
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = current_app.config['STATIC_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+        response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        encoding = _accepted_encoding(filename)
+        if encoding:
+            response = send_from_directory(folder, filename + ('.br' if encoding == 'br' else '.gz'),
+                                           mimetype=mimetypes.guess_type(filename)[0], max_age=max_age)
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = send_from_directory(folder, filename, max_age=max_age)
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+    if immutable:
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+
+def install(app):
+    """Take over the 'static' endpoint; app.static_folder is fingerprinted on first use"""
+    # Build ở lần dùng đầu tiên để khởi động worker không phải hash/nén cả thư mục static
+    manifest = AssetManifest(app.static_folder, autobuild=app.config.get('ASSET_FINGERPRINTS', True),
+                             compress=app.config.get('ASSET_PRECOMPRESS', True))
+    app.extensions['assets'] = manifest
+    # X-Sendfile: send_from_directory chỉ gửi header, Apache/lighttpd đọc file
+    if app.config.get('STATIC_SENDFILE') == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.url_filename(values['filename'])
+
+    app.view_functions['static'] = lambda filename: serve(manifest, filename)
+    return manifest
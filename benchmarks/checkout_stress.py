@@ -0,0 +1,96 @@
+"""
+Concurrent checkout stress test.
+
+Many buyers race for one product that has little stock. The script checks that
+units sold never exceed the starting stock and reports orders per second.
+
+    python benchmarks/checkout_stress.py --buyers 50 --stock 20 --quantity 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--buyers', type=int, default=50)
+    parser.add_argument('--stock', type=int, default=20)
+    parser.add_argument('--quantity', type=int, default=1)
+    args = parser.parse_args()
+
+    # Dùng CSDL tạm, không đụng tới instance/shop.db
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db, password_hasher
+    from models import User, Category, Product, OrderItem, upgrade_database
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        # Tất cả người mua đăng nhập từ cùng một IP, cùng lúc, với hash rẻ
+        'LOGIN_ATTEMPTS_PER_IP': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_MAX_PENDING': args.buyers,
+    })
+    with app.app_context():
+        upgrade_database()
+        category = Category(name='Stress')
+        db.session.add(category)
+        db.session.flush()
+        product = Product(name='Hot item', price=10, stock=args.stock, category_id=category.id)
+        db.session.add(product)
+        password = generate_password_hash('pw', method='pbkdf2:sha256:1000')
+        db.session.add_all([
+            User(username=f'buyer{i}', email=f'buyer{i}@example.com', password=password)
+            for i in range(args.buyers)
+        ])
+        db.session.commit()
+        product_id = product.id
+
+    barrier = threading.Barrier(args.buyers + 1)
+    results = {'ok': 0, 'rejected': 0, 'error': 0}
+    lock = threading.Lock()
+
+    def buyer(i):
+        client = app.test_client()
+        client.post('/login', data={'username': f'buyer{i}', 'password': 'pw'})
+        client.post(f'/cart/add/{product_id}', data={'quantity': args.quantity})
+        barrier.wait()
+        try:
+            response = client.post('/checkout', data={'address': 'x', 'phone': '0'})
+            outcome = 'ok' if response.headers.get('Location', '').endswith('/orders') else 'rejected'
+        except Exception:
+            outcome = 'error'
+        with lock:
+            results[outcome] += 1
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(args.buyers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        final_stock = db.session.get(Product, product_id).stock
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).scalar()
+        password_hasher.shutdown()
+
+    oversold = sold > args.stock or final_stock < 0 or sold != args.stock - final_stock
+    print(f'buyers={args.buyers} stock={args.stock} quantity={args.quantity}')
+    print(f'orders ok={results["ok"]} rejected={results["rejected"]} errors={results["error"]}')
+    print(f'units sold={sold} final stock={final_stock} oversold={"YES" if oversold else "no"}')
+    print(f'{results["ok"] / elapsed:.1f} orders/s ({elapsed:.3f}s)')
+    return 1 if oversold else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Seeded synthetic data generator.
+
+Fills a database with users, categories, products, open carts and a long
+order history spread over the past year, then rebuilds the search index,
+dashboard counters and sales rollups. The same --seed always produces the
+same data, so benchmark runs on different commits are comparable.
+
+    python benchmarks/datagen.py --database /tmp/shop-large.db --users 2000 --products 20000 --orders 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = (
+    'ao', 'quan', 'giay', 'dep', 'tui', 'mu', 'vay', 'khoac', 'so mi', 'thun',
+    'cotton', 'len', 'da', 'jean', 'kaki', 'lua', 'the thao', 'cong so', 'mua he', 'mua dong',
+    'den', 'trang', 'xanh', 'do', 'vang', 'nau', 'xam', 'hong', 'tim', 'be',
+)
+STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+STATUS_WEIGHTS = (5, 5, 10, 75, 5)
+BATCH_SIZE = 5000
+PASSWORD = 'pw'
+PASSWORD_METHOD = 'pbkdf2:sha256:1000'
+
+
+def _insert(db, model, rows):
+    from sqlalchemy import insert
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def generate(users=500, categories=20, products=5000, orders=20000, carts=200, seed=42):
+    """
+    Add synthetic rows to the app's database (inside an app context)
+    Args:
+        users: customers to create; they all log in with password 'pw'
+        carts: customers that get 1-5 items in their cart
+        seed: random seed, so the same arguments always give the same data
+    Returns:
+        dict of row counts created
+    """
+    from werkzeug.security import generate_password_hash
+    import search
+    from extensions import db
+    from models import (Category, Product, User, CartItem, InventoryMovement, Order, OrderItem,
+                        order_summary, rebuild_metrics, rebuild_sales_rollups, rebuild_recommendations)
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    # Băm mật khẩu một lần với số vòng thấp để sinh dữ liệu nhanh
+    password = generate_password_hash(PASSWORD, method=PASSWORD_METHOD)
+
+    first_user = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    _insert(db, User, [{
+        'id': first_user + i, 'username': f'user{first_user + i}',
+        'email': f'user{first_user + i}@example.com', 'password': password,
+        'full_name': f'User {first_user + i}', 'address': f'{i} Le Loi', 'phone': f'09{i:08d}',
+        'created_at': now - timedelta(days=rng.randint(0, 730)),
+    } for i in range(users)])
+    user_ids = range(first_user, first_user + users)
+
+    first_category = (db.session.query(db.func.max(Category.id)).scalar() or 0) + 1
+    _insert(db, Category, [{
+        'id': first_category + i, 'name': f'Danh muc {first_category + i}',
+        'description': ' '.join(rng.sample(WORDS, 6)),
+    } for i in range(categories)])
+    category_ids = range(first_category, first_category + categories)
+
+    first_product = (db.session.query(db.func.max(Product.id)).scalar() or 0) + 1
+    product_rows = []
+    for i in range(products):
+        price = rng.randrange(50, 2000) * 1000
+        product_rows.append({
+            'id': first_product + i,
+            'name': ' '.join(rng.sample(WORDS, 3)).capitalize() + f' {first_product + i}',
+            'description': ' '.join(rng.choices(WORDS, k=30)),
+            'price': price,
+            'sale_price': price * 0.8 if rng.random() < 0.2 else None,
+            'category_id': rng.choice(category_ids),
+            'stock': rng.randint(0, 500),
+            'created_at': now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399)),
+        })
+    _insert(db, Product, product_rows)
+    _insert(db, InventoryMovement, [{
+        'product_id': row['id'], 'delta': row['stock'], 'stock_after': row['stock'],
+        'reason': 'initial', 'created_at': row['created_at'],
+    } for row in product_rows])
+    prices = {row['id']: row['price'] for row in product_rows}
+    categories = {row['id']: row['category_id'] for row in product_rows}
+    names = {row['id']: row['name'] for row in product_rows}
+    product_ids = list(prices)
+
+    first_order = (db.session.query(db.func.max(Order.id)).scalar() or 0) + 1
+    first_item = (db.session.query(db.func.max(OrderItem.id)).scalar() or 0) + 1
+    order_rows, item_rows = [], []
+    for i in range(orders):
+        order_id = first_order + i
+        lines = rng.sample(product_ids, rng.randint(1, 4))
+        total, summary = 0, []
+        for product_id in lines:
+            quantity = rng.randint(1, 3)
+            total += prices[product_id] * quantity
+            summary.append((names[product_id], quantity))
+            item_rows.append({'id': first_item + len(item_rows), 'order_id': order_id,
+                              'product_id': product_id, 'category_id': categories[product_id],
+                              'quantity': quantity, 'price': prices[product_id]})
+        order_rows.append({
+            'id': order_id, 'user_id': rng.choice(user_ids),
+            'status': rng.choices(STATUSES, STATUS_WEIGHTS)[0], 'total_amount': total,
+            'shipping_address': 'Synthetic address', 'phone': '0900000000',
+            'created_at': now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399)),
+            **order_summary(summary),
+        })
+    _insert(db, Order, order_rows)
+    _insert(db, OrderItem, item_rows)
+
+    cart_rows = []
+    for user_id in rng.sample(user_ids, min(carts, users)):
+        for product_id in rng.sample(product_ids, rng.randint(1, 5)):
+            cart_rows.append({'user_id': user_id, 'product_id': product_id, 'quantity': rng.randint(1, 3)})
+    _insert(db, CartItem, cart_rows)
+
+    # Dữ liệu được chèn thẳng nên phải tính lại các bảng dẫn xuất
+    rebuild_metrics()
+    rebuild_sales_rollups()
+    rebuild_recommendations()
+    search.rebuild_search_index(db.session, Product.query.all())
+    db.session.commit()
+    return {'users': users, 'categories': categories, 'products': products,
+            'orders': orders, 'order_items': len(item_rows), 'cart_items': len(cart_rows)}
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--carts', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def generate_from_args(args):
+    return generate(users=args.users, categories=args.categories, products=args.products,
+                    orders=args.orders, carts=args.carts, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--database', required=True,
+                        help='SQLite file to fill (never the shipped instance/shop.db)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import upgrade_database
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(args.database)}', 'JOB_WORKERS': 0})
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade_database()
+        counts = generate_from_args(args)
+    print(', '.join(f'{name}={count}' for name, count in counts.items()))
+    print(f'{time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Route benchmark: browse, search, add-to-cart, checkout and admin flows.
+
+By default the app runs in-process on a temporary database filled by
+datagen.py, and the Flask test client replays the flows; every route gets
+p50/p95/p99 latency, requests/s and the number of SQL queries it issued.
+With --url the anonymous browse/search flows are sent over HTTP to a
+running server by --concurrency threads instead (no query counts then).
+Results are saved as JSON; pass an earlier file as --baseline to diff.
+
+    python benchmarks/load_test.py --iterations 200 --output before.json
+    python benchmarks/load_test.py --iterations 200 --output after.json --baseline before.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --concurrency 16 --seconds 30
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import datagen
+
+SEARCH_TERMS = ('ao', 'giay the thao', 'quan jean', 'cotton', 'khoac da', 'vay lua', 'tui xach')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, label, seconds, status, queries=None):
+        with self.lock:
+            entry = self.samples.setdefault(label, {'latencies': [], 'queries': [], 'errors': 0})
+            entry['latencies'].append(seconds)
+            if queries is not None:
+                entry['queries'].append(queries)
+            if status >= 500:
+                entry['errors'] += 1
+
+    def summary(self, elapsed):
+        routes = {}
+        total = 0
+        for label, entry in sorted(self.samples.items()):
+            latencies = sorted(entry['latencies'])
+            total += len(latencies)
+            ms = lambda value: round(value * 1000, 2)
+            routes[label] = {
+                'requests': len(latencies),
+                'errors': entry['errors'],
+                'p50_ms': ms(percentile(latencies, 50)),
+                'p95_ms': ms(percentile(latencies, 95)),
+                'p99_ms': ms(percentile(latencies, 99)),
+                'mean_ms': ms(sum(latencies) / len(latencies)),
+                'requests_per_second': round(len(latencies) / sum(latencies), 1),
+                'queries_mean': round(sum(entry['queries']) / len(entry['queries']), 2) if entry['queries'] else None,
+                'queries_max': max(entry['queries']) if entry['queries'] else None,
+            }
+        return {
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(total / elapsed, 1) if elapsed else None,
+            'routes': routes,
+        }
+
+
+def run_in_process(args, recorder):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ.setdefault('JOB_WORKERS', '0')
+    os.environ.setdefault('PASSWORD_HASH_METHOD', datagen.PASSWORD_METHOD)
+    from sqlalchemy import event
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db
+    from models import User, Product, Category, upgrade_database
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'WTF_CSRF_ENABLED': False,
+        # Các khách hàng giả lập đăng nhập từ cùng một IP; datagen băm mật khẩu bằng hash rẻ
+        'LOGIN_ATTEMPTS_PER_IP': 0,
+    })
+    # Lỗi 500 vẫn được đếm trong báo cáo; traceback chỉ in khi --verbose
+    app.logger.disabled = not args.verbose
+    with app.app_context():
+        upgrade_database()
+        dataset = datagen.generate_from_args(args)
+        db.session.add(User(username='bench-admin', email='bench-admin@example.com', is_admin=True,
+                            password=generate_password_hash(datagen.PASSWORD, method=datagen.PASSWORD_METHOD)))
+        db.session.commit()
+        product_ids = [row[0] for row in db.session.query(Product.id).filter(Product.stock > 50)]
+        category_ids = [row[0] for row in db.session.query(Category.id)]
+        usernames = [row[0] for row in db.session.query(User.username)
+                     .filter(User.is_admin.is_(False)).order_by(User.id).limit(args.clients)]
+
+        counter = {'queries': 0}
+
+        def count_query(*_):
+            counter['queries'] += 1
+        engines = {db.engine, app.extensions.get('read_engine')} - {None}
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', count_query)
+
+    def login(username):
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': datagen.PASSWORD})
+        if response.status_code != 302:
+            raise SystemExit(f'login failed for {username}: {response.status_code}')
+        return client
+
+    anonymous = app.test_client()
+    customers = [login(username) for username in usernames]
+    admin = login('bench-admin')
+    rng = random.Random(args.seed)
+
+    def hit(client, label, path, data=None):
+        before = counter['queries']
+        started = time.perf_counter()
+        response = client.post(path, data=data) if data is not None else client.get(path)
+        response.get_data()
+        recorder.add(label, time.perf_counter() - started, response.status_code, counter['queries'] - before)
+        return response
+
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        customer = customers[i % len(customers)]
+        product_id = rng.choice(product_ids)
+        category_id = rng.choice(category_ids)
+        term = rng.choice(SEARCH_TERMS)
+
+        # Duyệt và tìm kiếm: khách vãng lai (qua page cache) và khách đã đăng nhập
+        hit(anonymous, 'index (anonymous)', '/')
+        hit(anonymous, 'product_detail (anonymous)', f'/product/{product_id}')
+        hit(customer, 'index', '/')
+        hit(customer, 'index ?category', f'/?category={category_id}')
+        hit(customer, 'index ?search', f'/?search={term}')
+        hit(customer, 'product_detail', f'/product/{product_id}')
+        # Giỏ hàng và đặt hàng
+        hit(customer, 'add_to_cart', f'/cart/add/{product_id}', {'quantity': 1})
+        hit(customer, 'view_cart', '/cart')
+        if i % args.checkout_every == 0:
+            hit(customer, 'checkout', '/checkout', {'address': 'Bench street', 'phone': '0900000000'})
+            hit(customer, 'view_orders', '/orders')
+        if i % args.admin_every == 0:
+            hit(admin, 'admin_dashboard', '/admin')
+            hit(admin, 'admin_products', '/admin/products')
+            hit(admin, 'admin_orders', '/admin/orders')
+            hit(admin, 'admin_reports', '/admin/reports')
+    return dataset, time.perf_counter() - started
+
+
+def run_http(args, recorder):
+    base = args.url.rstrip('/')
+    home = urllib.request.urlopen(base + '/').read().decode('utf-8', 'replace')
+    product_ids = sorted(set(re.findall(r'/product/(\d+)', home))) or ['1']
+    category_ids = sorted(set(re.findall(r'category=(\d+)', home))) or ['']
+    stop = threading.Event()
+
+    def hit(label, path):
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base + path) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 599
+        recorder.add(label, time.perf_counter() - started, status)
+
+    def worker(n):
+        rng = random.Random(args.seed + n)
+        while not stop.is_set():
+            hit('index', '/')
+            hit('index ?category', f'/?category={rng.choice(category_ids)}')
+            hit('index ?search', '/?search=' + urllib.parse.quote(rng.choice(SEARCH_TERMS)))
+            hit('product_detail', f'/product/{rng.choice(product_ids)}')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return None, time.perf_counter() - started
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, baseline=None):
+    base_routes = (baseline or {}).get('routes', {})
+    print(f"{'route':<28}{'n':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}")
+    for label, stats in result['routes'].items():
+        line = (f"{label:<28}{stats['requests']:>6}{stats['errors']:>5}{stats['p50_ms']:>9}"
+                f"{stats['p95_ms']:>9}{stats['p99_ms']:>9}{stats['requests_per_second']:>9}"
+                f"{stats['queries_mean'] if stats['queries_mean'] is not None else '-':>9}")
+        before = base_routes.get(label)
+        if before:
+            delta = (stats['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            line += f"   p95 {delta:+.0f}%"
+            if stats['queries_mean'] is not None and before.get('queries_mean') is not None \
+                    and stats['queries_mean'] != before['queries_mean']:
+                line += f"  queries {before['queries_mean']} -> {stats['queries_mean']}"
+        print(line)
+    print(f"total {result['requests']} requests in {result['seconds']}s "
+          f"({result['requests_per_second']} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    datagen.add_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=100, help='in-process flow repetitions')
+    parser.add_argument('--clients', type=int, default=20, help='logged-in customers to rotate through')
+    parser.add_argument('--checkout-every', type=int, default=5)
+    parser.add_argument('--admin-every', type=int, default=10)
+    parser.add_argument('--verbose', action='store_true', help='show app log output')
+    parser.add_argument('--url', help='benchmark a running server over HTTP instead')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP mode threads')
+    parser.add_argument('--seconds', type=float, default=10, help='HTTP mode duration')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='earlier JSON result to compare against')
+    args = parser.parse_args()
+
+    recorder = Recorder()
+    if args.url:
+        dataset, elapsed = run_http(args, recorder)
+    else:
+        dataset, elapsed = run_in_process(args, recorder)
+
+    result = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'mode': 'http' if args.url else 'in-process',
+        'dataset': dataset,
+        'iterations': None if args.url else args.iterations,
+        **recorder.summary(elapsed),
+    }
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'saved {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Order export memory benchmark.
+
+Grows the order table step by step and streams a full CSV and JSONL export
+after each step, recording peak Python memory (tracemalloc) and time to first
+byte. With a streaming export the peak stays flat as the export grows.
+
+    python benchmarks/order_export_memory.py --steps 10000 50000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--steps', type=int, nargs='+', default=[10000, 50000, 100000],
+                        help='cumulative order counts to export at')
+    parser.add_argument('--items', type=int, default=3, help='lines per order')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'export.db')
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from extensions import db, password_hasher
+    from models import User, Category, Product, Order, OrderItem, upgrade_database
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'JOB_WORKERS': 0})
+    with app.app_context():
+        upgrade_database()
+        db.session.add(User(username='admin', email='admin@example.com', is_admin=True,
+                            password=generate_password_hash('pw', method='pbkdf2:sha256:1000')))
+        category = Category(name='Bench')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([Product(name=f'Product {i}', price=10 + i, stock=100, category_id=category.id)
+                            for i in range(100)])
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    created = 0
+    print(f'{"orders":>8} {"format":>6} {"bytes":>12} {"seconds":>8} {"first byte ms":>14} {"peak KiB":>9}')
+    for target in args.steps:
+        with app.app_context():
+            while created < target:
+                batch = min(5000, target - created)
+                orders = [{'id': created + i + 1, 'user_id': 1, 'status': 'completed', 'total_amount': 30.0,
+                           'shipping_address': 'Somewhere', 'phone': '0123456789',
+                           'created_at': start + timedelta(minutes=created + i)} for i in range(batch)]
+                db.session.execute(db.insert(Order), orders)
+                db.session.execute(db.insert(OrderItem), [
+                    {'order_id': o['id'], 'product_id': rng.randint(1, 100), 'quantity': 1, 'price': 10.0}
+                    for o in orders for _ in range(args.items)
+                ])
+                db.session.commit()
+                created += batch
+
+        for fmt in ('csv', 'jsonl'):
+            tracemalloc.start()
+            began = time.perf_counter()
+            response = client.get(f'/admin/orders/export.{fmt}')
+            first_byte = None
+            size = 0
+            for chunk in response.iter_encoded():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - began
+                size += len(chunk)
+            response.close()
+            elapsed = time.perf_counter() - began
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'{created:>8} {fmt:>6} {size:>12} {elapsed:>8.2f} {first_byte * 1000:>14.1f} {peak / 1024:>9.0f}')
+    with app.app_context():
+        password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
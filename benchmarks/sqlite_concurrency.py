@@ -0,0 +1,123 @@
+"""
+SQLite read/write concurrency benchmark for the engine profiles.
+
+Reader threads run catalogue-style SELECTs while writer threads update stock
+and insert rows, first with the 'default' profile (rollback journal, stock
+SQLAlchemy pool) and then with 'production' (WAL, synchronous=NORMAL, busy
+timeout, mmap, larger cache and pool). Reports reads/s, writes/s and
+"database is locked" errors for each profile.
+
+    python benchmarks/sqlite_concurrency.py --readers 8 --writers 2 --seconds 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import dbconfig
+
+ROWS = 5000
+
+
+def _prepare(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE product (id INTEGER PRIMARY KEY, category_id INTEGER, '
+            'name TEXT, price REAL, stock INTEGER)'))
+        conn.execute(text('CREATE INDEX ix_product_category ON product (category_id)'))
+        conn.execute(text('CREATE TABLE sale (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER)'))
+        conn.execute(
+            text('INSERT INTO product (category_id, name, price, stock) VALUES (:c, :n, :p, :s)'),
+            [{'c': i % 20, 'n': f'Product {i}', 'p': 10 + i % 90, 's': 1000} for i in range(ROWS)])
+
+
+def run_profile(profile, readers, writers, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(), f'{profile}.db')
+    uri = f'sqlite:///{db_path}'
+    engine = create_engine(uri, **dbconfig.engine_options(uri, profile))
+    dbconfig.install_pragmas(engine, profile)
+    _prepare(engine)
+
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def reader(n):
+        i = n
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(
+                        'SELECT id, name, price FROM product WHERE category_id = :c '
+                        'ORDER BY id DESC LIMIT 12'), {'c': i % 20}).fetchall()
+                count('reads')
+            except OperationalError:
+                count('locked')
+            i += 1
+
+    def writer(n):
+        i = n
+        while not stop.is_set():
+            product_id = i % ROWS + 1
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text('UPDATE product SET stock = stock - 1 WHERE id = :id'), {'id': product_id})
+                    conn.execute(text('INSERT INTO sale (product_id, quantity) VALUES (:id, 1)'), {'id': product_id})
+                count('writes')
+            except OperationalError:
+                count('locked')
+            i += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    return {
+        'profile': profile,
+        'reads_per_second': round(counts['reads'] / elapsed, 1),
+        'writes_per_second': round(counts['writes'] / elapsed, 1),
+        'locked_errors': counts['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = [run_profile(profile, args.readers, args.writers, args.seconds)
+               for profile in ('default', 'production')]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['profile']:<11} reads/s={result['reads_per_second']:<9} "
+              f"writes/s={result['writes_per_second']:<8} locked={result['locked_errors']}")
+
+
+if __name__ == '__main__':
+    main()
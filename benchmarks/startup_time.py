@@ -0,0 +1,97 @@
+"""
+Startup benchmark: how long a fresh worker takes to become ready.
+
+Each run starts a new interpreter (like a gunicorn worker) and times
+importing the app module, create_app() and the first request, on a
+temporary database that was migrated once beforehand (as `flask db-upgrade`
+would at deploy). It also times building isolated in-memory apps, schema
+included, the way a test suite would.
+
+    python benchmarks/startup_time.py --runs 10 --memory-apps 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, statistics, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'JOB_WORKERS': 0})
+created = time.perf_counter()
+response = app.test_client().get('/login')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+
+from extensions import db
+from models import upgrade_database
+memory_apps = []
+for _ in range(int(sys.argv[2])):
+    began = time.perf_counter()
+    memory_app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOB_WORKERS': 0})
+    with memory_app.app_context():
+        upgrade_database()
+    memory_apps.append(time.perf_counter() - began)
+    with memory_app.app_context():
+        db.engine.dispose()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'memory_app_ms': statistics.median(memory_apps) * 1000 if memory_apps else None,
+}))
+'''
+
+
+def run_child(database_url, memory_apps):
+    output = subprocess.check_output([sys.executable, '-c', CHILD, database_url, str(memory_apps)],
+                                     cwd=ROOT, text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def migrate(database_url):
+    subprocess.check_call([sys.executable, '-c', (
+        'import sys\n'
+        'from app import create_app\n'
+        'from models import upgrade_database\n'
+        "app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'JOB_WORKERS': 0})\n"
+        'with app.app_context():\n'
+        '    upgrade_database()\n'
+    ), database_url], cwd=ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--memory-apps', type=int, default=10, help='in-memory apps to build per run')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    # Dùng CSDL tạm, không đụng tới instance/shop.db
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    migrate(database_url)
+    runs = [run_child(database_url, args.memory_apps) for _ in range(args.runs)]
+
+    result = {}
+    print(f"{'phase':<18}{'median ms':>11}{'min ms':>9}{'max ms':>9}")
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'memory_app_ms'):
+        values = [run[key] for run in runs if run[key] is not None]
+        if not values:
+            continue
+        result[key] = round(statistics.median(values), 1)
+        print(f'{key[:-3]:<18}{statistics.median(values):>11.1f}{min(values):>9.1f}{max(values):>9.1f}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'runs': args.runs, 'memory_apps': args.memory_apps, **result}, f, indent=2)
+        print(f'saved {args.output}')
+
+
+if __name__ == '__main__':
+    main()
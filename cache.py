@@ -0,0 +1,131 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalBackend:
+    """
+    In-process stand-in for a shared cache server (Redis, memcached...).
+    A real backend only needs the same get/set/delete/incr methods, storing bytes.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, (0, None))[0]) + 1
+            self._data[key] = (value, None)
+            return value
+
+
+class CatalogCache:
+    """
+    LRU + TTL cache for catalogue reads, with an optional shared second tier.
+
+    Every entry belongs to one or more groups (e.g. 'categories', 'product:5',
+    'category:2'). Invalidation bumps a group's generation number, which is part
+    of the entry key, so all entries of that group miss from then on, including
+    entries in other processes when the generation lives in a shared backend.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, group):
+        if self.backend is not None:
+            return int(self.backend.get(f'gen:{group}') or 0)
+        with self._lock:
+            return self._generations.get(group, 0)
+
+    def invalidate(self, *groups):
+        for group in groups:
+            if self.backend is not None:
+                self.backend.incr(f'gen:{group}')
+            else:
+                with self._lock:
+                    self._generations[group] = self._generations.get(group, 0) + 1
+
+    def get_or_load(self, key, loader, groups=()):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        None results are not cached.
+        """
+        full_key = key + ''.join(f'|{group}@{self.generation(group)}' for group in groups)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[0]
+
+        if self.backend is not None:
+            raw = self.backend.get(f'val:{full_key}')
+            if raw is not None:
+                value = pickle.loads(raw)
+                self._store(full_key, value, now)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        value = loader()
+        with self._lock:
+            self.misses += 1
+        if value is not None:
+            self._store(full_key, value, now)
+            if self.backend is not None:
+                self.backend.set(f'val:{full_key}', pickle.dumps(value), self.ttl)
+        return value
+
+    def _store(self, full_key, value, now):
+        with self._lock:
+            self._entries[full_key] = (value, now + self.ttl)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
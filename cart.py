@@ -0,0 +1,170 @@
+"""
+Cart engine: quantities change through atomic upserts, totals come from one
+aggregate query, and visitors who are not logged in keep a cart in the session.
+"""
+from types import SimpleNamespace
+
+from flask import current_app, session
+from flask_login import current_user
+from sqlalchemy import delete
+
+import analytics
+from extensions import db
+from models import CartItem, Product
+
+class CartError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors  # list of {'product_id', 'error'}
+
+def _parse_cart_changes(changes):
+    """
+    Validate a list of line changes
+    Args:
+        changes: dicts with product_id and either quantity (new quantity, 0 removes) or delta (amount to add)
+    Returns:
+        list of (product_id, quantity, delta) with exactly one of quantity/delta set
+    """
+    if not isinstance(changes, list) or not changes:
+        raise CartError([{'product_id': None, 'error': 'lines must be a non-empty list'}])
+    parsed, errors = [], []
+    for change in changes:
+        try:
+            product_id = int(change['product_id'])
+            if 'quantity' in change:
+                quantity, delta = int(change['quantity']), None
+                if quantity < 0:
+                    raise ValueError
+            else:
+                quantity, delta = None, int(change.get('delta', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            errors.append({'product_id': change.get('product_id') if isinstance(change, dict) else None,
+                           'error': 'Dòng không hợp lệ'})
+            continue
+        parsed.append((product_id, quantity, delta))
+    if errors:
+        raise CartError(errors)
+    return parsed
+
+def _stock_error(product_id, stock):
+    return {'product_id': product_id, 'error': f'Chỉ còn {stock} sản phẩm trong kho!'}
+
+def apply_cart_changes(user_id, changes):
+    """
+    Apply several line changes to a user's cart in one transaction, all or nothing
+    Raises:
+        CartError: a line is invalid or would exceed stock; nothing is written
+    """
+    parsed = _parse_cart_changes(changes)
+    product_ids = sorted({product_id for product_id, _, _ in parsed})
+    try:
+        for product_id, quantity, delta in parsed:
+            key = {'user_id': user_id, 'product_id': product_id}
+            if quantity == 0:
+                db.session.execute(delete(CartItem).where(CartItem.user_id == user_id,
+                                                          CartItem.product_id == product_id)
+                                   .execution_options(synchronize_session=False))
+            elif quantity is not None:
+                analytics.upsert_values(db.session, CartItem, key, {'quantity': quantity})
+            else:
+                analytics.upsert_increment(db.session, CartItem, key, {'quantity': delta})
+        # Delta âm có thể đưa số lượng về 0: bỏ dòng đó
+        db.session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.quantity <= 0)
+                           .execution_options(synchronize_session=False))
+        # Một câu kiểm tra cho cả lô: sản phẩm không tồn tại hoặc vượt tồn kho
+        invalid = db.session.query(CartItem.product_id, Product.stock)\
+            .outerjoin(Product, Product.id == CartItem.product_id)\
+            .filter(CartItem.user_id == user_id, CartItem.product_id.in_(product_ids),
+                    db.or_(Product.id.is_(None), CartItem.quantity > Product.stock)).all()
+        if invalid:
+            raise CartError([_stock_error(product_id, stock) if stock is not None else
+                             {'product_id': product_id, 'error': 'Sản phẩm không tồn tại'}
+                             for product_id, stock in invalid])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def cart_lines(user_id):
+    """A user's cart lines with the price actually charged (sale price if any)"""
+    return db.session.query(CartItem.id, CartItem.product_id, CartItem.quantity, Product.name,
+                            Product.image_url, Product.stock, Product.unit_price.label('unit_price'))\
+        .join(Product, Product.id == CartItem.product_id)\
+        .filter(CartItem.user_id == user_id).order_by(CartItem.id).all()
+
+def cart_totals(user_id):
+    """Line count, units and total of a user's cart from a single aggregate query"""
+    lines, units, total = db.session.query(
+        db.func.count(CartItem.id),
+        db.func.coalesce(db.func.sum(CartItem.quantity), 0),
+        db.func.coalesce(db.func.sum(CartItem.quantity * Product.unit_price), 0),
+    ).join(Product, Product.id == CartItem.product_id).filter(CartItem.user_id == user_id).one()
+    return {'lines': lines, 'units': units, 'total': total}
+
+# Giỏ hàng của khách chưa đăng nhập: {product_id: quantity} trong session
+def guest_cart_lines():
+    cart = session.get('cart') or {}
+    if not cart:
+        return []
+    products = Product.query.filter(Product.id.in_([int(product_id) for product_id in cart])).all()
+    # Dòng của khách dùng product_id làm id (xem remove_from_cart)
+    return [SimpleNamespace(id=p.id, product_id=p.id, quantity=cart[str(p.id)], name=p.name,
+                            image_url=p.image_url, stock=p.stock, unit_price=p.unit_price)
+            for p in products]
+
+def apply_guest_cart_changes(changes):
+    """Same as apply_cart_changes, for the cart kept in the session"""
+    parsed = _parse_cart_changes(changes)
+    cart = dict(session.get('cart') or {})
+    stock = dict(db.session.query(Product.id, Product.stock)
+                 .filter(Product.id.in_({product_id for product_id, _, _ in parsed})))
+    errors = [{'product_id': product_id, 'error': 'Sản phẩm không tồn tại'}
+              for product_id, _, _ in parsed if product_id not in stock]
+    if errors:
+        raise CartError(errors)
+    for product_id, quantity, delta in parsed:
+        key = str(product_id)
+        cart[key] = quantity if quantity is not None else cart.get(key, 0) + delta
+        if cart[key] <= 0:
+            del cart[key]
+    errors = [_stock_error(int(key), stock[int(key)]) for key, quantity in cart.items()
+              if int(key) in stock and quantity > stock[int(key)]]
+    if errors:
+        raise CartError(errors)
+    session['cart'] = cart
+
+def merge_guest_cart(user_id):
+    """Move the session cart into the user's cart after login, capping lines at the stock"""
+    cart = session.pop('cart', None)
+    if not cart:
+        return
+    changes = [{'product_id': int(product_id), 'delta': quantity} for product_id, quantity in cart.items()]
+    try:
+        apply_cart_changes(user_id, changes)
+    except CartError:
+        # Từng dòng một: dòng vượt tồn kho thì giữ số lượng tối đa có thể
+        for change in changes:
+            try:
+                apply_cart_changes(user_id, [change])
+            except CartError as e:
+                for error in e.errors:
+                    product = db.session.get(Product, error['product_id'])
+                    if product is not None and product.stock > 0:
+                        apply_cart_changes(user_id, [{'product_id': product.id, 'quantity': product.stock}])
+
+def _use_guest_cart():
+    return not current_user.is_authenticated and current_app.config['GUEST_CARTS']
+
+def cart_payload():
+    if current_user.is_authenticated:
+        lines, totals = cart_lines(current_user.id), cart_totals(current_user.id)
+    else:
+        lines = guest_cart_lines()
+        totals = {'lines': len(lines), 'units': sum(line.quantity for line in lines),
+                  'total': sum(line.quantity * line.unit_price for line in lines)}
+    return {
+        'items': [{'product_id': line.product_id, 'name': line.name, 'quantity': line.quantity,
+                   'unit_price': line.unit_price, 'subtotal': line.quantity * line.unit_price,
+                   'stock': line.stock} for line in lines],
+        **totals,
+    }
@@ -0,0 +1,130 @@
+"""
+Product images and the cached catalogue reads used by the storefront and admin.
+"""
+import os
+import uuid
+from types import SimpleNamespace
+
+from flask import current_app
+
+import images
+import pagination
+from extensions import catalog_cache, db, page_cache
+from models import Category, Product, ProductPair, RelatedProducts
+
+def allowed_file(filename):
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def save_image(uploaded_file):
+    """
+    Run the uploaded image through the image pipeline (resized WebP/JPEG
+    variants stored under the content hash, metadata stripped)
+    Args:
+        uploaded_file: FileStorage object from form submission
+    Returns:
+        str: value for Product.image_url or None if save failed
+    """
+    if not uploaded_file:
+        return None
+
+    try:
+        original_filename = uploaded_file.filename
+        extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else None
+        return images.process_image(uploaded_file.read(), extension, current_app.config['UPLOAD_FOLDER'])
+
+    except Exception as e:
+        current_app.logger.error(f"Error saving image: {str(e)}")
+        return None
+
+def stage_upload(uploaded_file):
+    """
+    Quickly park an upload in UPLOAD_FOLDER/incoming so the image pipeline can
+    run in a background job
+    Returns:
+        str: staged filename or None if the file type is not allowed
+    """
+    if not uploaded_file or not allowed_file(uploaded_file.filename):
+        return None
+    extension = uploaded_file.filename.rsplit('.', 1)[1].lower()
+    incoming = os.path.join(current_app.config['UPLOAD_FOLDER'], 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    filename = f'{uuid.uuid4().hex}.{extension}'
+    uploaded_file.save(os.path.join(incoming, filename))
+    return filename
+
+def delete_image(image_url, keep_if_used_by=None):
+    """Remove an image and its variants unless another product still uses it"""
+    if not image_url:
+        return
+    still_used = Product.query.filter(Product.image_url == image_url)
+    if keep_if_used_by is not None:
+        still_used = still_used.filter(Product.id != keep_if_used_by)
+    if still_used.first():
+        return
+    for filename in images.variant_files(image_url):
+        try:
+            os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+        except OSError:
+            pass
+
+PRODUCT_CACHE_FIELDS = ('id', 'name', 'description', 'price', 'sale_price', 'image_url', 'category_id')
+
+def cached_categories():
+    return catalog_cache.get_or_load('categories', lambda: [
+        SimpleNamespace(id=c.id, name=c.name, description=c.description)
+        for c in Category.query.all()
+    ], groups=('categories',))
+
+def cached_product(product_id):
+    def load():
+        product = db.session.get(Product, product_id)
+        if product is None:
+            return None
+        return SimpleNamespace(**{field: getattr(product, field) for field in PRODUCT_CACHE_FIELDS})
+    return catalog_cache.get_or_load(f'product:{product_id}', load, groups=('products', f'product:{product_id}'))
+
+def cached_related_products(product):
+    def load():
+        limit = current_app.config['RELATED_PRODUCTS_SHOWN']
+        row = db.session.get(RelatedProducts, product.id)
+        if row is None:
+            # Sản phẩm mới chưa có danh sách tính sẵn
+            products = Product.query.filter_by(category_id=product.category_id)\
+                .filter(Product.id != product.id).limit(limit).all()
+        else:
+            ids = [int(i) for i in row.related_ids.split(',') if i][:limit]
+            found = {p.id: p for p in Product.query.filter(Product.id.in_(ids))} if ids else {}
+            products = [found[i] for i in ids if i in found]
+        return [SimpleNamespace(id=p.id, name=p.name) for p in products]
+    return catalog_cache.get_or_load(f'related:{product.id}', load,
+                                     groups=('products', f'product:{product.id}', f'category:{product.category_id}',
+                                             f'related:{product.id}'))
+
+def copurchase_neighbours(product_id):
+    """Products whose precomputed related lists may show product_id (read before its pairs are deleted)"""
+    return [pid for pid, in db.session.query(ProductPair.product_id).filter(ProductPair.other_id == product_id)]
+
+def invalidate_product_cache(product_id, *category_ids, listed_in=()):
+    """
+    Drop cached payloads for a product and the related lists of its categories
+    Args:
+        listed_in: products whose related lists show this one (copurchase_neighbours);
+            pass them when its name changes or it is deleted, since those lists cross categories
+    """
+    groups = [f'category:{c}' for c in set(category_ids) if c is not None]
+    if product_id is not None:
+        groups.append(f'product:{product_id}')
+    groups.extend(f'related:{pid}' for pid in set(listed_in))
+    catalog_cache.invalidate(*groups)
+    page_cache.invalidate('catalog')
+
+def invalidate_all_products_cache():
+    """Used after bulk changes where invalidating product by product would cost more"""
+    catalog_cache.invalidate('products')
+    page_cache.invalidate('catalog')
+    pagination.invalidate_counts('products')
+
+def invalidate_category_cache():
+    catalog_cache.invalidate('categories')
+    page_cache.invalidate('catalog')
@@ -0,0 +1,261 @@
+"""
+`flask` CLI commands; registered on the app by create_app().
+"""
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import assets
+import images
+import importer
+import inventory
+import migrations
+import pagination
+import queryplan
+import search
+from catalog import delete_image, invalidate_all_products_cache
+from extensions import catalog_cache, db
+from models import (Order, Product, User, rebuild_metrics, rebuild_recommendations, rebuild_sales_rollups,
+                    upgrade_database)
+from product_import import import_products
+from tasks import job_queue
+
+@click.command('rebuild-analytics')
+@with_appcontext
+def rebuild_analytics_command():
+    """Recompute sales rollups from the full order history"""
+    days = rebuild_sales_rollups()
+    db.session.commit()
+    print(f'Rebuilt sales rollups for {days} days')
+
+@click.command('rebuild-recommendations')
+@with_appcontext
+def rebuild_recommendations_command():
+    """Recompute co-purchase counts and related-products lists from the full order history"""
+    count = rebuild_recommendations()
+    db.session.commit()
+    catalog_cache.invalidate('products')
+    print(f'Rebuilt related products for {count} products')
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress static files (run at deploy if static/ is read-only at runtime)"""
+    manifest = assets.AssetManifest(current_app.static_folder).build(compress=True)
+    for filename, hashed in sorted(manifest.hashed.items()):
+        print(f'{filename} -> {hashed}')
+
+@click.command('rebuild-metrics')
+@with_appcontext
+def rebuild_metrics_command():
+    """Recompute dashboard counters and the low-stock list from scratch"""
+    counts = rebuild_metrics()
+    db.session.commit()
+    print(', '.join(f'{name}={value}' for name, value in counts.items()))
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Apply pending schema migrations and fill derived tables (run once per deploy)"""
+    applied = upgrade_database(log=print)
+    print(f'{len(applied)} migrations applied' if applied else 'Database is up to date')
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """List schema migrations and whether they have been applied"""
+    done = migrations.applied_versions(db.engine)
+    for version, name, _ in migrations.MIGRATIONS:
+        print(f"{version:>4}  {'applied' if version in done else 'pending':8} {name}")
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Re-index every product for full-text search"""
+    search.ensure_search_index(db.session)
+    count = search.rebuild_search_index(db.session, Product.query.yield_per(1000))
+    db.session.commit()
+    print(f'Indexed {count} products')
+
+@click.command('process-images')
+@with_appcontext
+def process_images_command():
+    """Move images uploaded before the pipeline existed onto hashed variants and remove the originals"""
+    converted, originals = 0, set()
+    for product in Product.query.filter(Product.image_url.isnot(None)).all():
+        if images.is_processed(product.image_url):
+            continue
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], product.image_url)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            extension = product.image_url.rsplit('.', 1)[-1].lower()
+            image_url = images.process_image(f.read(), extension, current_app.config['UPLOAD_FOLDER'])
+        if image_url:
+            originals.add(product.image_url)
+            product.image_url = image_url
+            converted += 1
+    db.session.commit()
+    if converted:
+        # Trang sản phẩm/danh mục đã cache vẫn trỏ tới ảnh cũ
+        invalidate_all_products_cache()
+    kept = []
+    for image_url in sorted(originals):
+        # delete_image() giữ lại file còn được sản phẩm khác dùng
+        delete_image(image_url)
+        if os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], image_url)):
+            kept.append(image_url)
+    print(f'Converted {converted} product images, removed {len(originals) - len(kept)} superseded originals')
+    for image_url in kept:
+        print(f'  kept {image_url} (still in use)')
+
+@click.command('run-jobs')
+@with_appcontext
+@click.option('--once', is_flag=True, help='Run pending jobs and exit.')
+def run_jobs_command(once):
+    """Run background jobs in the foreground"""
+    if once:
+        print(f'Ran {job_queue.run_pending()} jobs')
+        return
+    job_queue.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_queue.stop()
+
+@click.command('import-products')
+@with_appcontext
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--images-dir', type=click.Path(exists=True, file_okay=False),
+              help='Directory that relative image paths in the file point into.')
+def import_products_command(path, fmt, batch_size, images_dir):
+    """Bulk import products from a CSV or JSON Lines file"""
+    with open(path, 'rb') as f:
+        report = import_products(f, fmt or importer.detect_format(path), batch_size, images_dir)
+    print(f'{report.rows} rows in {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/s): '
+          f'{report.inserted} inserted, {report.updated} updated, {report.failed} failed, '
+          f'{report.images_queued} images queued')
+    for line_number, message in report.errors:
+        print(f'  line {line_number}: {message}')
+
+@click.command('inventory-reconcile')
+@with_appcontext
+@click.option('--fix', is_flag=True, help='Record a correction movement for every mismatch.')
+def inventory_reconcile_command(fix):
+    """Check that every product's stock equals the sum of its inventory movements"""
+    mismatches = inventory.reconcile(fix=fix)
+    for product_id, stock, ledger_total in mismatches:
+        print(f'  product {product_id}: stock {stock}, ledger {ledger_total}')
+    if not mismatches:
+        print('Inventory ledger matches stock')
+    elif fix:
+        print(f'Recorded {len(mismatches)} corrections')
+    else:
+        raise SystemExit(1)
+
+# (name, method, path, user) for the hot routes; {placeholders} are filled by plan_sample_ids()
+HOT_ROUTES = [
+    ('add_to_cart', 'POST', '/cart/add/{product}', 'customer'),
+    ('view_orders', 'GET', '/orders', 'customer'),
+    ('view_orders (next page)', 'GET', '/orders?cursor={order_cursor}', 'customer'),
+    ('order_detail', 'GET', '/order/{order}', 'customer'),
+    ('admin_orders', 'GET', '/admin/orders?status={order_status}', 'admin'),
+    ('admin_orders (all)', 'GET', '/admin/orders', 'admin'),
+    ('admin_order_detail', 'GET', '/admin/order/{order}', 'admin'),
+    ('index', 'GET', '/', 'customer'),
+    ('index (category)', 'GET', '/?category={category}', 'customer'),
+    ('index (category, next page)', 'GET', '/?category={category}&cursor={product_cursor}', 'customer'),
+    ('product_detail', 'GET', '/product/{product}', 'customer'),
+    ('admin_products', 'GET', '/admin/products', 'admin'),
+    ('dashboard', 'GET', '/admin', 'admin'),
+    ('inventory history', 'GET', '/admin/product/{product}/inventory', 'admin'),
+]
+# Bảng nhỏ được đọc toàn bộ có chủ ý (menu danh mục, bộ đếm dashboard)
+LOOKUP_TABLES = ('category', 'metric')
+
+def plan_sample_ids():
+    """Ids and cursors that HOT_ROUTES are requested with, or None if the database has too little data"""
+    admin = User.query.filter_by(is_admin=True).first()
+    customer_id = db.session.query(Order.user_id).group_by(Order.user_id)\
+        .order_by(db.func.count().desc()).limit(1).scalar()
+    product = Product.query.filter(Product.category_id.isnot(None))\
+        .order_by(Product.created_at.desc(), Product.id.desc()).first()
+    if admin is None or customer_id is None or product is None:
+        return None
+    order = Order.query.filter_by(user_id=customer_id).order_by(Order.created_at.desc(), Order.id.desc()).first()
+    return {
+        'admin': admin.id,
+        'customer': customer_id,
+        'product': product.id,
+        'category': product.category_id,
+        'product_cursor': pagination.encode_cursor(product.created_at, product.id, 'next'),
+        'order': order.id,
+        'order_status': order.status,
+        'order_cursor': pagination.encode_cursor(order.created_at, order.id, 'next'),
+    }
+
+def hot_route_plans(routes=HOT_ROUTES):
+    """
+    Request each route as its user and EXPLAIN the SELECTs it ran
+    Returns:
+        list of (name, status code, [(statement, plan details, problems)]), or None without sample data
+    """
+    ids = plan_sample_ids()
+    if ids is None:
+        return None
+    engines = [e for e in (db.engine, current_app.extensions['read_engine']) if e is not None]
+    results = []
+    for name, method, path, user in routes:
+        status, plans = queryplan.route_plans(current_app, engines, method, path.format(**ids), ids[user])
+        results.append((name, status, [(statement, details, queryplan.problems(details, LOOKUP_TABLES))
+                                       for statement, details in plans]))
+    return results
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Request the hot routes, EXPLAIN every SELECT they run and fail if one scans a whole table"""
+    if db.engine.dialect.name != 'sqlite':
+        print('EXPLAIN QUERY PLAN check only runs on SQLite')
+        return
+    # Không khởi động job nền trong lệnh này; các route POST (ghi vào CSDL) chỉ được kiểm tra trong tests/
+    current_app.config['JOB_WORKERS'] = 0
+    results = hot_route_plans([route for route in HOT_ROUTES if route[1] == 'GET'])
+    if results is None:
+        print('Need an admin, a customer with orders and a product to check query plans')
+        return
+    failed = False
+    for name, status, plans in results:
+        if status >= 400:
+            failed = True
+            print(f'FAIL  {name}: HTTP {status}')
+        for statement, details, bad in plans:
+            failed = failed or bool(bad)
+            print(f"{'FAIL' if bad else 'ok':4}  {name}: {' | '.join(details)}")
+    if failed:
+        raise SystemExit(1)
+
+COMMANDS = [
+    rebuild_analytics_command,
+    rebuild_recommendations_command,
+    build_assets_command,
+    rebuild_metrics_command,
+    db_upgrade_command,
+    db_status_command,
+    rebuild_search_index_command,
+    process_images_command,
+    run_jobs_command,
+    import_products_command,
+    check_query_plans_command,
+    inventory_reconcile_command,
+]
+
+def init_app(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -0,0 +1,118 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.dml import UpdateBase
+
+# Cấu hình engine theo profile; chọn bằng DB_ENGINE_PROFILE
+PROFILES = {
+    # Mặc định của SQLite / SQLAlchemy, giữ để so sánh
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,            # ms chờ khi CSDL đang bị khóa ghi
+        'mmap_size': 256 * 1024 * 1024,  # đọc qua mmap tới 256 MB
+        'cache_size': -64000,            # 64 MB page cache cho mỗi kết nối
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_recycle': 1800,
+    },
+}
+
+_SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+
+
+def _is_sqlite(uri):
+    return str(uri).startswith('sqlite')
+
+
+def _is_memory(uri):
+    uri = str(uri)
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def engine_options(uri, profile):
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URI and profile"""
+    settings = PROFILES[profile]
+    options = {}
+    if _is_sqlite(uri):
+        options['connect_args'] = {'check_same_thread': False}
+        if 'busy_timeout' in settings:
+            options['connect_args']['timeout'] = settings['busy_timeout'] / 1000
+        if _is_memory(uri):
+            return options
+    else:
+        options['pool_pre_ping'] = True
+    for key in ('pool_size', 'max_overflow', 'pool_recycle'):
+        if key in settings:
+            options[key] = settings[key]
+    return options
+
+
+def install_pragmas(engine, profile, read_only=False):
+    """Run the profile's PRAGMAs on every new SQLite connection"""
+    if engine.dialect.name != 'sqlite':
+        return
+    settings = PROFILES[profile]
+    pragmas = [(name, settings[name]) for name in _SQLITE_PRAGMAS if name in settings]
+    if _is_memory(engine.url):
+        pragmas = [(name, value) for name, value in pragmas if name != 'journal_mode']
+    if read_only:
+        pragmas.append(('query_only', 'ON'))
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def create_read_engine(app, primary_engine):
+    """
+    Engine for read-only GET traffic, or None if READ_DATABASE_URL is unset.
+    'primary' means a second pool of query_only connections to the primary
+    database (useful for SQLite in WAL mode); anything else is a replica URI.
+    """
+    uri = app.config.get('READ_DATABASE_URL')
+    if not uri:
+        return None
+    profile = app.config['DB_ENGINE_PROFILE']
+    if uri == 'primary':
+        uri = primary_engine.url
+    engine = create_engine(uri, **engine_options(uri, profile))
+    install_pragmas(engine, profile, read_only=True)
+    return engine
+
+
+class RoutingSession(Session):
+    """
+    Sends SELECTs of GET requests to the app's read engine when one is configured.
+    Flushes, DML and anything after the first write in a request go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            read_engine = current_app.extensions.get('read_engine')
+            if read_engine is not None:
+                if self._flushing or isinstance(clause, UpdateBase):
+                    g.db_wrote = True
+                elif g.get('db_use_read_engine') and not g.get('db_wrote'):
+                    return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_primary(f):
+    """Mark a GET view that writes, so all its queries use the primary engine"""
+    f.use_primary = True
+    return f
+
+
+def route_reads(app):
+    """Let GET requests read from the read engine unless the view is marked use_primary"""
+    @app.before_request
+    def choose_engine():
+        view = app.view_functions.get(request.endpoint)
+        g.db_use_read_engine = request.method == 'GET' and not getattr(view, 'use_primary', False)
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+
+# Số dòng gom lại trước mỗi lần gửi cho client
+CHUNK_ROWS = 500
+
+ORDER_COLUMNS = ('order_id', 'created_at', 'status', 'user_id', 'username', 'total_amount',
+                 'shipping_address', 'phone', 'note')
+LINE_COLUMNS = ('product_id', 'product_name', 'quantity', 'price')
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def csv_lines(rows):
+    """
+    Yield CSV text in chunks, one line per order item (order columns repeated)
+    Args:
+        rows: iterable of tuples in ORDER_COLUMNS + LINE_COLUMNS order
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ORDER_COLUMNS + LINE_COLUMNS)
+    # Gửi header ngay, trước khi chạy truy vấn: với bộ lọc thưa, dòng dữ liệu đầu tiên có thể đến rất muộn
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow([_value(v) for v in row])
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def jsonl_orders(rows):
+    """
+    Yield one JSON object per order with its items nested; rows must be
+    ordered by order id so each order's lines arrive together
+    """
+    n_order = len(ORDER_COLUMNS)
+    current, chunk = None, []
+    for row in rows:
+        if current is None or current['order_id'] != row[0]:
+            if current is not None:
+                chunk.append(json.dumps(current, ensure_ascii=False) + '\n')
+                if len(chunk) >= CHUNK_ROWS:
+                    yield ''.join(chunk)
+                    chunk = []
+            current = {k: _value(v) for k, v in zip(ORDER_COLUMNS, row[:n_order])}
+            current['items'] = []
+        if row[n_order] is not None:
+            current['items'].append(dict(zip(LINE_COLUMNS, row[n_order:])))
+    if current is not None:
+        chunk.append(json.dumps(current, ensure_ascii=False) + '\n')
+    if chunk:
+        yield ''.join(chunk)
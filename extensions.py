@@ -0,0 +1,43 @@
+"""
+Extension objects shared by every module, bound to an app in create_app().
+
+Nothing here touches the database or reads config at import time. Objects
+that depend on an app's config (caches, password hasher, login limiter) are
+built per app by init_app() and reached through the proxies below, so
+several apps (e.g. isolated test apps) can live in one process.
+"""
+from flask import current_app
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.local import LocalProxy
+
+import cache
+import dbconfig
+import passwords
+import ratelimit
+
+db = SQLAlchemy(session_options={'class_': dbconfig.RoutingSession})
+login_manager = LoginManager()
+login_manager.login_view = 'storefront.login'
+
+catalog_cache = LocalProxy(lambda: current_app.extensions['catalog_cache'])
+# Cache trang HTML cho khách chưa đăng nhập và các đoạn HTML dùng chung
+page_cache = LocalProxy(lambda: current_app.extensions['page_cache'])
+password_hasher = LocalProxy(lambda: current_app.extensions['password_hasher'])
+login_limiter = LocalProxy(lambda: current_app.extensions['login_limiter'])
+
+
+def init_app(app):
+    db.init_app(app)
+    login_manager.init_app(app)
+    for name in ('catalog_cache', 'page_cache'):
+        app.extensions[name] = cache.CatalogCache(maxsize=app.config['CATALOG_CACHE_SIZE'],
+                                                  ttl=app.config['CATALOG_CACHE_TTL'],
+                                                  backend=app.config['CATALOG_CACHE_BACKEND'])
+    # Process pool băm mật khẩu chỉ được tạo ở lần băm đầu tiên
+    app.extensions['password_hasher'] = passwords.PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    )
+    app.extensions['login_limiter'] = ratelimit.TokenBucketLimiter()
@@ -0,0 +1,18 @@
+from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField
+from wtforms import FloatField, IntegerField, SelectField, StringField, TextAreaField
+from wtforms.validators import DataRequired, NumberRange, Optional
+from wtforms.widgets import HiddenInput
+
+
+class ProductForm(FlaskForm):
+    name = StringField('Tên sản phẩm', validators=[DataRequired()])
+    price = FloatField('Giá', validators=[DataRequired(), NumberRange(min=0)])
+    stock = IntegerField('Số lượng trong kho', validators=[DataRequired(), NumberRange(min=0)])
+    # Tồn kho lúc mở form sửa; lưu form chỉ cộng/trừ phần admin đã đổi
+    original_stock = IntegerField(widget=HiddenInput(), validators=[Optional()])
+    category_id = SelectField('Danh mục', coerce=int, validators=[DataRequired()])
+    description = TextAreaField('Mô tả')
+    image = FileField('Hình ảnh sản phẩm', validators=[
+        FileAllowed(['jpg', 'jpeg', 'png', 'gif', 'webp'], 'Chỉ cho phép file ảnh!')
+    ])
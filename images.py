@@ -0,0 +1,128 @@
+import hashlib
+import io
+import os
+import re
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow không bắt buộc: không có thì chỉ lưu file gốc theo hash
+    Image = None
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# Tên biến thể -> chiều rộng tối đa (px)
+VARIANTS = {'thumb': 160, 'card': 480, 'detail': 1200}
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+QUALITY = 80
+# Giá trị lưu trong Product.image_url cho ảnh đã qua pipeline: <hash>.detail.jpg
+_PROCESSED_RE = re.compile(r'^(?P<digest>[0-9a-f]{24})\.detail\.jpg$')
+# Mọi file do pipeline ghi ra đều đặt tên theo hash nội dung: <hash>.<...>
+_CONTENT_ADDRESSED_RE = re.compile(r'^[0-9a-f]{24}\.[a-z.]+$')
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()[:24]
+
+
+def variant_name(digest, variant, fmt):
+    return f'{digest}.{variant}.{fmt}'
+
+
+def _flatten(image):
+    """Drop alpha onto white and convert to RGB (JPEG has no transparency)"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_image(data, extension, upload_folder):
+    """
+    Store an uploaded image under its content hash, with resized variants
+    Args:
+        data: raw bytes of the upload
+        extension: lower-case file extension of the upload
+        upload_folder: directory the files are written to
+    Returns:
+        str: value for Product.image_url, or None if the file is not a usable image
+    """
+    if extension not in ALLOWED_EXTENSIONS:
+        return None
+    digest = content_digest(data)
+    os.makedirs(upload_folder, exist_ok=True)
+
+    if Image is None:
+        filename = f'{digest}.{extension}'
+        path = os.path.join(upload_folder, filename)
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(data)
+        return filename
+
+    filename = variant_name(digest, 'detail', 'jpg')
+    if os.path.exists(os.path.join(upload_folder, filename)):
+        return filename  # Ảnh trùng nội dung: dùng lại bản đã có
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.load()
+            image = _flatten(source)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    # Ghi lại ảnh mới nên metadata (EXIF, GPS...) không còn
+    for variant, width in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for fmt, pil_format in FORMATS.items():
+            path = os.path.join(upload_folder, variant_name(digest, variant, fmt))
+            tmp_path = f'{path}.tmp'
+            resized.save(tmp_path, pil_format, quality=QUALITY, optimize=True)
+            os.replace(tmp_path, path)
+    return filename
+
+
+def is_processed(image_url):
+    return bool(_PROCESSED_RE.match(image_url or ''))
+
+
+def is_content_addressed(filename):
+    """True for upload files named by their content hash (safe to cache forever)"""
+    return bool(_CONTENT_ADDRESSED_RE.match(filename or ''))
+
+
+def variant_files(image_url):
+    """All files on disk that belong to a stored image_url"""
+    match = _PROCESSED_RE.match(image_url or '')
+    if not match:
+        return [image_url] if image_url else []
+    return [variant_name(match.group('digest'), variant, fmt)
+            for variant in VARIANTS for fmt in FORMATS]
+
+
+def image_path(image_url, variant='card', fmt='jpg'):
+    """
+    Path under static/ for one variant, falling back to the original file
+    for images uploaded before the pipeline existed
+    """
+    match = _PROCESSED_RE.match(image_url or '')
+    if not match:
+        return f'uploads/{image_url}'
+    return f'uploads/{variant_name(match.group("digest"), variant, fmt)}'
+
+
+def image_srcset(image_url, fmt='jpg', url_for=None):
+    """
+    srcset value listing every variant width, or None for legacy images
+    Args:
+        url_for: callable mapping a static path to a URL
+    """
+    match = _PROCESSED_RE.match(image_url or '')
+    if not match:
+        return None
+    return ', '.join(
+        f'{url_for(image_path(image_url, variant, fmt))} {width}w'
+        for variant, width in VARIANTS.items()
+    )
@@ -0,0 +1,189 @@
+"""
+Inventory ledger and low-stock alerts.
+
+Every change to Product.stock goes through this module and appends an
+InventoryMovement row (delta, resulting stock, reason), so a product's stock
+always equals the sum of its movements and can be audited and reconciled
+(`flask inventory-reconcile`). Ledger rows are queued on the session and
+written in one statement when it commits.
+
+The same code watches the thresholds: when a change takes a product below
+LOW_STOCK_THRESHOLD, down to zero, or back up to the threshold, the
+low-stock table is updated and an alert goes to INVENTORY_ALERT_SINK after
+the transaction commits (never for changes that are rolled back). A sink is
+any object with send(alert); LogSink and JsonlSink are provided.
+"""
+import json
+import threading
+from datetime import datetime
+
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import delete, event, insert, update
+
+import analytics
+from extensions import db
+from models import InventoryMovement, LowStockProduct, Product
+
+# Lý do (InventoryMovement.reason): opening (số dư khi bật sổ kho), initial (sản phẩm mới),
+# sale, reservation, release, adjustment (admin sửa), import, cancel_restock, reopen (mở lại
+# đơn đã hủy), removed (xóa sản phẩm), correction (`flask inventory-reconcile --fix` ghi bù)
+
+
+def format_alert(alert):
+    if alert['kind'] == 'out':
+        state = 'is out of stock'
+    elif alert['kind'] == 'low':
+        state = f"is low on stock: {alert['stock']} left (threshold {alert['threshold']})"
+    else:
+        state = f"is back in stock: {alert['stock']}"
+    return f"Product {alert['product_id']} {state} after {alert['reason']}"
+
+
+class LogSink:
+    """Write alerts to the app log"""
+
+    def send(self, alert):
+        current_app.logger.warning(format_alert(alert))
+
+
+class JsonlSink:
+    """Append alerts as JSON lines to a local file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, alert):
+        line = json.dumps(alert, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def change_stock(product_id, delta):
+    """
+    Atomically add delta to a product's stock. A negative delta is only applied
+    when enough stock is left (UPDATE ... WHERE stock >= ?).
+    Returns:
+        the new stock, or None if the row was not updated
+    """
+    stmt = update(Product).where(Product.id == product_id)
+    if delta < 0:
+        stmt = stmt.where(Product.stock >= -delta)
+    stmt = stmt.values(stock=Product.stock + delta).execution_options(synchronize_session=False)
+    if db.session.get_bind().dialect.update_returning:
+        return db.session.execute(stmt.returning(Product.stock)).scalar_one_or_none()
+    if db.session.execute(stmt).rowcount != 1:
+        return None
+    return db.session.query(Product.stock).filter(Product.id == product_id).scalar()
+
+
+def record(product_id, delta, stock_after, reason, order_id=None):
+    """Queue a ledger row for a stock change; it is written when the session commits"""
+    user_id = None
+    if has_request_context() and current_user.is_authenticated:
+        user_id = current_user.id
+    db.session.info.setdefault('inventory_movements', []).append({
+        'product_id': product_id, 'delta': delta, 'stock_after': stock_after, 'reason': reason,
+        'order_id': order_id, 'user_id': user_id, 'created_at': datetime.utcnow(),
+    })
+
+
+def watch(product_id, previous, stock, reason, order_id=None, alert=True):
+    """
+    Keep the low-stock table in step with a product's new stock and queue an
+    alert if a threshold was crossed
+    """
+    threshold = current_app.config['LOW_STOCK_THRESHOLD']
+    # Chỉ ghi vào bảng tồn kho thấp khi sản phẩm đang hoặc vừa ở dưới ngưỡng
+    if stock < threshold:
+        analytics.upsert_values(db.session, LowStockProduct, {'product_id': product_id}, {'stock': stock})
+    elif previous < threshold:
+        db.session.execute(delete(LowStockProduct).where(LowStockProduct.product_id == product_id)
+                           .execution_options(synchronize_session=False))
+    if not alert:
+        return
+    if stock <= 0 < previous:
+        kind = 'out'
+    elif stock < threshold <= previous:
+        kind = 'low'
+    elif previous < threshold <= stock:
+        kind = 'restocked'
+    else:
+        return
+    db.session.info.setdefault('inventory_alerts', []).append({
+        'kind': kind, 'product_id': product_id, 'stock': stock, 'previous': previous,
+        'threshold': threshold, 'reason': reason, 'order_id': order_id,
+        'at': datetime.utcnow().isoformat(timespec='seconds'),
+    })
+
+
+def adjust_stock(product_id, delta, reason, order_id=None):
+    """
+    change_stock() plus its ledger row and threshold check
+    Returns:
+        bool: True if the stock was changed
+    """
+    stock = change_stock(product_id, delta)
+    if stock is None:
+        return False
+    record(product_id, delta, stock, reason, order_id)
+    watch(product_id, stock - delta, stock, reason, order_id)
+    return True
+
+
+@event.listens_for(db.session, 'before_commit')
+def _write_movements(session):
+    rows = session.info.pop('inventory_movements', None)
+    if rows:
+        session.execute(insert(InventoryMovement), rows)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _send_alerts(session):
+    alerts = session.info.pop('inventory_alerts', None)
+    sink = current_app.config.get('INVENTORY_ALERT_SINK')
+    if not alerts or sink is None:
+        return
+    for alert in alerts:
+        try:
+            sink.send(alert)
+        except Exception as e:
+            # Lỗi của sink không được làm hỏng request đã commit
+            current_app.logger.error(f'Inventory alert sink failed: {e}')
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop('inventory_movements', None)
+    session.info.pop('inventory_alerts', None)
+
+
+def history(product_id, before=None, limit=100):
+    """A product's movements, newest first, keyset-paginated on id"""
+    query = InventoryMovement.query.filter(InventoryMovement.product_id == product_id)
+    if before:
+        query = query.filter(InventoryMovement.id < before)
+    return query.order_by(InventoryMovement.id.desc()).limit(limit).all()
+
+
+def reconcile(fix=False):
+    """
+    Compare every product's stock with the sum of its ledger movements
+    Args:
+        fix: record a 'correction' movement for each difference
+    Returns:
+        list of (product_id, stock, ledger_total) that did not match
+    """
+    ledger = db.session.query(InventoryMovement.product_id,
+                              db.func.sum(InventoryMovement.delta).label('total'))\
+        .group_by(InventoryMovement.product_id).subquery()
+    total = db.func.coalesce(ledger.c.total, 0)
+    mismatches = db.session.query(Product.id, db.func.coalesce(Product.stock, 0), total)\
+        .outerjoin(ledger, ledger.c.product_id == Product.id)\
+        .filter(db.func.coalesce(Product.stock, 0) != total).order_by(Product.id).all()
+    if fix:
+        for product_id, stock, ledger_total in mismatches:
+            record(product_id, stock - ledger_total, stock, 'correction')
+        db.session.commit()
+    return mismatches
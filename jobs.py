@@ -0,0 +1,179 @@
+import json
+import threading
+import traceback
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+
+class JobQueue:
+    """
+    Small in-process job runner backed by a database table.
+
+    Jobs are rows in the `job` table, so anything queued but not yet run is
+    picked up again after a restart. Workers claim a job by taking a lease
+    (locked_until); a job whose worker died is retried once its lease expires.
+    Handlers are registered once on the queue; each app bound with init_app()
+    gets its own worker threads.
+    """
+
+    def __init__(self, db, model, app=None, workers=2, poll_interval=0.5,
+                 lease_seconds=300, max_attempts=3):
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.handlers = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, workers=None):
+        app.extensions['job_queue'] = _Workers(app, self.workers if workers is None else workers)
+
+    def _workers_of(self, app=None):
+        return (app or current_app).extensions['job_queue']
+
+    def task(self, name):
+        """Register a handler: @queue.task('name') def handler(**payload)"""
+        def decorator(f):
+            self.handlers[name] = f
+            return f
+        return decorator
+
+    def enqueue(self, name, delay=0, **payload):
+        """
+        Add a job to the current session; it becomes visible to workers on commit
+        Returns:
+            the Job row
+        """
+        if name not in self.handlers:
+            raise KeyError(f'Unknown job: {name}')
+        job = self.model(name=name, payload=json.dumps(payload),
+                         run_at=datetime.utcnow() + timedelta(seconds=delay))
+        self.db.session.add(job)
+        self._workers_of().wakeup.set()
+        return job
+
+    def start(self, app=None):
+        """Start the app's worker threads once per process"""
+        workers = self._workers_of(app)
+        if workers.threads:
+            return
+        with workers.start_lock:
+            if workers.threads:
+                return
+            for i in range(workers.count):
+                thread = threading.Thread(target=self._worker, args=(workers,),
+                                          name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                workers.threads.append(thread)
+
+    def stop(self, app=None, timeout=5):
+        workers = self._workers_of(app)
+        workers.stop.set()
+        workers.wakeup.set()
+        for thread in workers.threads:
+            thread.join(timeout)
+        workers.threads = []
+        workers.stop.clear()
+
+    def run_pending(self, app=None):
+        """Run every due job in the calling thread; returns how many ran"""
+        count = 0
+        with self._workers_of(app).app.app_context():
+            while self._run_one():
+                count += 1
+        return count
+
+    def _worker(self, workers):
+        while not workers.stop.is_set():
+            try:
+                with workers.app.app_context():
+                    ran = self._run_one()
+            except Exception:
+                workers.app.logger.error(f'Job worker error: {traceback.format_exc()}')
+                ran = False
+            if not ran:
+                workers.wakeup.wait(self.poll_interval)
+                workers.wakeup.clear()
+
+    def _claim(self):
+        Job = self.model
+        session = self.db.session
+        now = datetime.utcnow()
+        due = or_(
+            (Job.status == 'queued') & (Job.run_at <= now),
+            (Job.status == 'running') & (Job.locked_until < now)
+        )
+        candidates = session.query(Job.id).filter(due).order_by(Job.id).limit(10).all()
+        for job_id, in candidates:
+            claimed = session.execute(
+                update(Job).where(Job.id == job_id).where(due).values(
+                    status='running',
+                    attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=self.lease_seconds),
+                    started_at=now
+                ).execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+            if claimed:
+                return session.get(Job, job_id)
+        session.commit()
+        return None
+
+    def _run_one(self):
+        job = self._claim()
+        if job is None:
+            return False
+        session = self.db.session
+        job_id = job.id
+        try:
+            self.handlers[job.name](**json.loads(job.payload or '{}'))
+            job.status = 'done'
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            session.commit()
+        except Exception:
+            session.rollback()
+            job = session.get(self.model, job_id)
+            job.error = traceback.format_exc()[-2000:]
+            if job.attempts >= self.max_attempts:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+            else:
+                # Thử lại sau 2, 4, 8... giây
+                job.status = 'queued'
+                job.run_at = datetime.utcnow() + timedelta(seconds=2 ** job.attempts)
+            session.commit()
+            current_app.logger.error(f'Job {job.id} ({job.name}) failed: {job.error}')
+        finally:
+            session.remove()
+        return True
+
+
+class _Workers:
+    """Worker threads of one app"""
+
+    def __init__(self, app, count):
+        self.app = app
+        self.count = count
+        self.threads = []
+        self.wakeup = threading.Event()
+        self.stop = threading.Event()
+        self.start_lock = threading.Lock()
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
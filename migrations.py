@@ -0,0 +1,188 @@
+"""
+Versioned schema migrations.
+
+Each migration is (version, name, function(connection, metadata)) and runs
+once, inside its own transaction; applied versions are recorded in the
+schema_migrations table. Migrations must be idempotent (checkfirst / IF NOT
+EXISTS) because the baseline creates tables from the current models, so on a
+fresh database later steps may find their objects already there.
+"""
+import json
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+_meta = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _meta,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _baseline(conn, metadata):
+    """Every table defined by the models (what db.create_all() used to do)"""
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _hot_path_indexes(conn, metadata):
+    """Secondary indexes for the storefront/admin hot paths, unique cart lines"""
+    # Gộp các dòng giỏ hàng trùng (user_id, product_id) trước khi thêm ràng buộc unique
+    duplicates = conn.execute(text(
+        "SELECT user_id, product_id, MIN(id), SUM(quantity) FROM cart_item "
+        "GROUP BY user_id, product_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    for user_id, product_id, keep_id, quantity in duplicates:
+        conn.execute(text("UPDATE cart_item SET quantity = :q WHERE id = :id"), {'q': quantity, 'id': keep_id})
+        conn.execute(text(
+            "DELETE FROM cart_item WHERE user_id = :u AND product_id = :p AND id != :id"
+        ), {'u': user_id, 'p': product_id, 'id': keep_id})
+
+    statements = [
+        'CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_item_user_product ON cart_item (user_id, product_id)',
+        'CREATE INDEX IF NOT EXISTS ix_order_user_created ON "order" (user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_order_status_created ON "order" (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_order_created_at ON "order" (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_order_item_order_id ON order_item (order_id)',
+        'CREATE INDEX IF NOT EXISTS ix_order_item_product_id ON order_item (product_id)',
+        'CREATE INDEX IF NOT EXISTS ix_product_category_created ON product (category_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_product_created_at ON product (created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_product_stock ON product (stock)',
+    ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _recommendation_tables(conn, metadata):
+    """Co-purchase counts and the precomputed related-products lists"""
+    for name in ('product_pair', 'related_products'):
+        metadata.tables[name].create(conn, checkfirst=True)
+
+
+def _inventory_ledger(conn, metadata):
+    """Stock movement ledger, opened with each product's current stock"""
+    metadata.tables['inventory_movement'].create(conn, checkfirst=True)
+    # Số dư đầu kỳ để tổng các delta luôn bằng Product.stock (xem `flask inventory-reconcile`)
+    conn.execute(text(
+        "INSERT INTO inventory_movement (product_id, delta, stock_after, reason, created_at) "
+        "SELECT id, COALESCE(stock, 0), COALESCE(stock, 0), 'opening', :now FROM product "
+        "WHERE id NOT IN (SELECT product_id FROM inventory_movement)"
+    ), {'now': datetime.utcnow()})
+
+
+def _order_summaries(conn, metadata):
+    """Order.item_count/item_summary, backfilled from the existing line items"""
+    from models import order_summary
+
+    columns = {c['name'] for c in inspect(conn).get_columns('order')}
+    if 'item_count' not in columns:
+        conn.execute(text('ALTER TABLE "order" ADD COLUMN item_count INTEGER'))
+    if 'item_summary' not in columns:
+        conn.execute(text('ALTER TABLE "order" ADD COLUMN item_summary VARCHAR(255)'))
+    # Theo lô 1000 đơn để không giữ cả lịch sử trong bộ nhớ
+    update = text('UPDATE "order" SET item_count = :item_count, item_summary = :item_summary WHERE id = :id')
+    last_id = 0
+    while True:
+        order_ids = conn.execute(text(
+            'SELECT id FROM "order" WHERE id > :last_id AND item_summary IS NULL ORDER BY id LIMIT 1000'
+        ), {'last_id': last_id}).scalars().all()
+        if not order_ids:
+            break
+        rows = conn.execute(text(
+            'SELECT oi.order_id, p.name, oi.quantity FROM order_item oi '
+            'LEFT JOIN product p ON p.id = oi.product_id '
+            'WHERE oi.order_id BETWEEN :first_id AND :last_id ORDER BY oi.order_id, oi.id'
+        ), {'first_id': order_ids[0], 'last_id': order_ids[-1]}).fetchall()
+        batch = [{'id': order_id, **order_summary((name, quantity) for _, name, quantity in lines)}
+                 for order_id, lines in groupby(rows, key=lambda row: row[0])]
+        if batch:
+            conn.execute(update, batch)
+        last_id = order_ids[-1]
+
+
+def _order_item_categories(conn, metadata):
+    """OrderItem.category_id: the product's category at sale time, for the category sales rollup"""
+    columns = {c['name'] for c in inspect(conn).get_columns('order_item')}
+    if 'category_id' not in columns:
+        conn.execute(text('ALTER TABLE order_item ADD COLUMN category_id INTEGER'))
+    # Đơn cũ không lưu danh mục lúc bán; lấy danh mục hiện tại như CategorySales vẫn đang tính
+    conn.execute(text(
+        'UPDATE order_item SET category_id = (SELECT category_id FROM product WHERE product.id = order_item.product_id) '
+        'WHERE category_id IS NULL'
+    ))
+
+
+def _copurchase_flags(conn, metadata):
+    """Order.copurchases_recorded, set for the orders already counted in product_pair"""
+    columns = {c['name'] for c in inspect(conn).get_columns('order')}
+    if 'copurchases_recorded' not in columns:
+        conn.execute(text('ALTER TABLE "order" ADD COLUMN copurchases_recorded BOOLEAN NOT NULL DEFAULT 0'))
+    # product_pair đếm các đơn chưa hủy, trừ những đơn mà job update_recommendations còn chưa chạy
+    conn.execute(text('UPDATE "order" SET copurchases_recorded = (status != \'cancelled\')'))
+    pending = {}
+    for payload, in conn.execute(text(
+        "SELECT payload FROM job WHERE name = 'update_recommendations' AND status IN ('queued', 'running')"
+    )):
+        payload = json.loads(payload or '{}')
+        order_id = payload.get('order_id')
+        pending[order_id] = pending.get(order_id, 0) + payload.get('sign', 1)
+    for order_id, sign in pending.items():
+        if sign:
+            conn.execute(text('UPDATE "order" SET copurchases_recorded = :recorded WHERE id = :id'),
+                         {'recorded': sign < 0, 'id': order_id})
+
+
+def _pagination_keys(conn, metadata):
+    """Fill NULL created_at on orders and products, the leading key of keyset pagination"""
+    # SQLite không thêm được NOT NULL cho cột có sẵn; model khai báo nullable=False cho CSDL mới,
+    # còn pagination.encode_cursor() từ chối khóa NULL
+    for table in ('"order"', 'product'):
+        conn.execute(text(
+            f'UPDATE {table} SET created_at = COALESCE(updated_at, (SELECT MIN(created_at) FROM {table}), :now) '
+            'WHERE created_at IS NULL'
+        ), {'now': datetime.utcnow()})
+
+
+MIGRATIONS = [
+    (1, 'baseline', _baseline),
+    (2, 'hot path indexes', _hot_path_indexes),
+    (3, 'recommendations', _recommendation_tables),
+    (4, 'inventory ledger', _inventory_ledger),
+    (5, 'order summaries', _order_summaries),
+    (6, 'order item categories', _order_item_categories),
+    (7, 'co-purchase flags', _copurchase_flags),
+    (8, 'pagination keys', _pagination_keys),
+]
+
+
+def applied_versions(engine):
+    if not inspect(engine).has_table('schema_migrations'):
+        return set()
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def pending(engine):
+    done = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade(engine, metadata, log=None):
+    """
+    Apply every pending migration in order
+    Returns:
+        list of (version, name) applied
+    """
+    _meta.create_all(engine, checkfirst=True)
+    applied = []
+    for version, name, migrate in pending(engine):
+        with engine.begin() as conn:
+            migrate(conn, metadata)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()))
+        applied.append((version, name))
+        if log:
+            log(f'Applied migration {version}: {name}')
+    return applied
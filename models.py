@@ -0,0 +1,380 @@
+"""
+Database models and the helpers that keep derived tables (dashboard
+counters, sales rollups, related products) in step with them.
+"""
+from datetime import datetime
+
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import aliased
+
+import analytics
+import importer
+import migrations
+import search
+from extensions import catalog_cache, db
+
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(150), unique=True, nullable=False)
+    email = db.Column(db.String(150), unique=True, nullable=False)
+    password = db.Column(db.String(150), nullable=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    full_name = db.Column(db.String(150))
+    address = db.Column(db.String(500))
+    phone = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    cart_items = db.relationship('CartItem', backref='user', lazy=True)
+    orders = db.relationship('Order', backref='user', lazy=True)
+
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    products = db.relationship('Product', backref='category', lazy=True)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    price = db.Column(db.Float, nullable=False)
+    sale_price = db.Column(db.Float)  # Giá khuyến mãi
+    image_url = db.Column(db.String(500))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    stock = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    cart_items = db.relationship('CartItem', backref='product', lazy=True)
+    order_items = db.relationship('OrderItem', backref='product', lazy=True)
+    __table_args__ = (
+        db.Index('ix_product_category_created', 'category_id', 'created_at'),
+        db.Index('ix_product_created_at', 'created_at'),
+        db.Index('ix_product_stock', 'stock'),
+    )
+
+    @hybrid_property
+    def unit_price(self):
+        """Giá bán thực tế: giá khuyến mãi nếu có"""
+        return self.sale_price if self.sale_price is not None else self.price
+
+    @unit_price.expression
+    def unit_price(cls):
+        return db.func.coalesce(cls.sale_price, cls.price)
+
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, default=1)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('uq_cart_item_user_product', 'user_id', 'product_id', unique=True),)
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(50), default='pending')
+    total_amount = db.Column(db.Float, nullable=False)
+    shipping_address = db.Column(db.String(500), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    note = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    # Tóm tắt dòng hàng lưu lúc đặt hàng để lịch sử đơn không phải đọc order_item (xem order_summary)
+    item_count = db.Column(db.Integer)
+    item_summary = db.Column(db.String(255))
+    # Đơn đang được tính trong ProductPair chưa; job update_recommendations dựa vào đây để không cộng hai lần
+    copurchases_recorded = db.Column(db.Boolean, nullable=False, default=False)
+    items = db.relationship('OrderItem', backref='order', lazy=True)
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'user_id', 'created_at'),
+        db.Index('ix_order_status_created', 'status', 'created_at'),
+        db.Index('ix_order_created_at', 'created_at'),
+    )
+
+class Job(db.Model):
+    """Background job; see jobs.JobQueue"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+class StockReservation(db.Model):
+    """Stock held for a user while they are on the checkout page"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    # Danh mục của sản phẩm lúc bán; thống kê theo danh mục (kể cả khi hủy đơn) tính theo cột này
+    category_id = db.Column(db.Integer)
+    __table_args__ = (
+        db.Index('ix_order_item_order_id', 'order_id'),
+        db.Index('ix_order_item_product_id', 'product_id'),
+    )
+
+class Metric(db.Model):
+    """Running counter shown on the admin dashboard"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class LowStockProduct(db.Model):
+    """Products currently below LOW_STOCK_THRESHOLD, kept in sync with Product.stock"""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    stock = db.Column(db.Integer, nullable=False, index=True)
+
+class InventoryMovement(db.Model):
+    """Append-only ledger of stock changes; see inventory.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    # Không khóa ngoại: lịch sử kho được giữ lại cả khi sản phẩm bị xóa
+    product_id = db.Column(db.Integer, nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    stock_after = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)
+    order_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_inventory_movement_product_id', 'product_id', 'id'),)
+
+# Số liệu dashboard: cập nhật dần trong cùng transaction với thay đổi gốc
+METRIC_NAMES = ('users', 'orders', 'products')
+
+def increment_metric(name, delta=1):
+    db.session.execute(update(Metric).where(Metric.name == name)
+                       .values(value=Metric.value + delta)
+                       .execution_options(synchronize_session=False))
+
+def rebuild_metrics():
+    """Recompute every counter and the low-stock set from the source tables"""
+    counts = {
+        'users': User.query.count(),
+        'orders': Order.query.count(),
+        'products': Product.query.count(),
+    }
+    db.session.execute(delete(Metric))
+    db.session.execute(insert(Metric), [{'name': name, 'value': counts[name]} for name in METRIC_NAMES])
+    db.session.execute(delete(LowStockProduct))
+    db.session.execute(insert(LowStockProduct).from_select(
+        ['product_id', 'stock'],
+        db.select(Product.id, Product.stock).where(Product.stock < current_app.config['LOW_STOCK_THRESHOLD'])
+    ))
+    return counts
+
+# Bảng tổng hợp doanh số, cập nhật dần khi đặt hàng / hủy đơn
+class DailySales(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductSales(db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0, index=True)
+
+class CategorySales(db.Model):
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+def order_lines(order_id):
+    """(product_id, category_id at sale time, quantity, price) for each line of an order"""
+    return db.session.query(OrderItem.product_id, OrderItem.category_id, OrderItem.quantity, OrderItem.price)\
+        .filter(OrderItem.order_id == order_id).all()
+
+def order_summary(lines, names=3):
+    """
+    Precomputed summary shown in a customer's order history
+    Args:
+        lines: iterable of (product_name, quantity) in order
+        names: how many product names to keep
+    Returns:
+        dict with item_count (units) and item_summary (first product names)
+    """
+    count, products = 0, []
+    for name, quantity in lines:
+        count += quantity
+        products.append(name or '?')
+    summary = ', '.join(products[:names]) + (f' +{len(products) - names}' if len(products) > names else '')
+    return {'item_count': count, 'item_summary': summary[:255]}
+
+def record_sale(order, lines, sign=1, cancelled=0):
+    """
+    Apply an order to the sales rollups
+    Args:
+        order: the Order (created_at and total_amount are used)
+        lines: iterable of (product_id, category_id, quantity, price)
+        sign: 1 to add the order, -1 to reverse it (e.g. when it is cancelled)
+        cancelled: change to the day's cancelled-order count
+    """
+    units = 0
+    for product_id, category_id, quantity, price in lines:
+        units += quantity
+        amounts = {'units': sign * quantity, 'revenue': sign * quantity * price}
+        analytics.upsert_increment(db.session, ProductSales, {'product_id': product_id}, amounts)
+        # Tính theo danh mục lúc bán (OrderItem.category_id), không theo danh mục hiện tại
+        if category_id is not None:
+            analytics.upsert_increment(db.session, CategorySales, {'category_id': category_id}, amounts)
+    analytics.upsert_increment(db.session, DailySales, {'day': order.created_at.date()}, {
+        'orders': sign, 'units': sign * units,
+        'revenue': sign * order.total_amount, 'cancelled': cancelled
+    })
+
+def rebuild_sales_rollups():
+    """Recompute every sales rollup from Order/OrderItem (cancelled orders excluded)"""
+    for model in (DailySales, ProductSales, CategorySales):
+        db.session.execute(delete(model))
+    active = Order.status != 'cancelled'
+    day = db.func.date(Order.created_at)
+
+    days = {}
+    for d, orders, revenue in db.session.query(day, db.func.count(Order.id), db.func.sum(Order.total_amount))\
+            .filter(active).group_by(day):
+        days[d] = {'orders': orders, 'revenue': revenue or 0, 'units': 0, 'cancelled': 0}
+    for d, units in db.session.query(day, db.func.sum(OrderItem.quantity))\
+            .join(OrderItem, OrderItem.order_id == Order.id).filter(active).group_by(day):
+        days[d]['units'] = units or 0
+    for d, cancelled in db.session.query(day, db.func.count(Order.id))\
+            .filter(Order.status == 'cancelled').group_by(day):
+        days.setdefault(d, {'orders': 0, 'revenue': 0, 'units': 0})['cancelled'] = cancelled
+    if days:
+        db.session.execute(insert(DailySales), [
+            {'day': d if not isinstance(d, str) else datetime.strptime(d, '%Y-%m-%d').date(), **values}
+            for d, values in days.items()
+        ])
+
+    revenue = db.func.sum(OrderItem.quantity * OrderItem.price)
+    product_rows = db.session.query(OrderItem.product_id, db.func.sum(OrderItem.quantity), revenue)\
+        .join(Order, Order.id == OrderItem.order_id).filter(active).group_by(OrderItem.product_id).all()
+    if product_rows:
+        db.session.execute(insert(ProductSales), [
+            {'product_id': p, 'units': u, 'revenue': r} for p, u, r in product_rows
+        ])
+    category_rows = db.session.query(OrderItem.category_id, db.func.sum(OrderItem.quantity), revenue)\
+        .join(Order, Order.id == OrderItem.order_id)\
+        .filter(active, OrderItem.category_id.isnot(None)).group_by(OrderItem.category_id).all()
+    if category_rows:
+        db.session.execute(insert(CategorySales), [
+            {'category_id': c, 'units': u, 'revenue': r} for c, u, r in category_rows
+        ])
+    return len(days)
+
+# Gợi ý "thường được mua cùng": số đơn có cả hai sản phẩm, và top-K tính sẵn cho từng sản phẩm
+class ProductPair(db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True, index=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+class RelatedProducts(db.Model):
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    related_ids = db.Column(db.String(500), nullable=False, default='')  # "12,5,9", điểm cao trước
+
+def record_copurchases(product_ids, sign=1):
+    """Count one order (or remove it, sign=-1) for every pair of the given products"""
+    product_ids = sorted(set(product_ids))
+    for product_id in product_ids:
+        for other_id in product_ids:
+            if other_id != product_id:
+                analytics.upsert_increment(db.session, ProductPair,
+                                           {'product_id': product_id, 'other_id': other_id}, {'orders': sign})
+
+def _category_fill(product_id, category_id, exclude, limit):
+    """Newest products of the same category, for products with few co-purchases"""
+    if category_id is None or limit <= 0:
+        return []
+    return [row[0] for row in db.session.query(Product.id)
+            .filter(Product.category_id == category_id, Product.id != product_id, Product.id.notin_(exclude))
+            .order_by(Product.created_at.desc(), Product.id.desc()).limit(limit)]
+
+def refresh_related_products(product_ids):
+    """Recompute the stored top-K list of each given product"""
+    k = current_app.config['RELATED_PRODUCTS_K']
+    product_ids = list(product_ids)
+    for product_id, category_id in db.session.query(Product.id, Product.category_id)\
+            .filter(Product.id.in_(product_ids)):
+        related = [row[0] for row in db.session.query(ProductPair.other_id)
+                   .filter(ProductPair.product_id == product_id, ProductPair.orders > 0)
+                   .order_by(ProductPair.orders.desc(), ProductPair.other_id).limit(k)]
+        related += _category_fill(product_id, category_id, related, k - len(related))
+        analytics.upsert_values(db.session, RelatedProducts, {'product_id': product_id},
+                                {'related_ids': ','.join(map(str, related))})
+    catalog_cache.invalidate(*[f'related:{product_id}' for product_id in product_ids])
+
+def rebuild_recommendations():
+    """Recompute every co-purchase count and related list from OrderItem (cancelled orders excluded)"""
+    k = current_app.config['RELATED_PRODUCTS_K']
+    db.session.execute(delete(ProductPair))
+    db.session.execute(delete(RelatedProducts))
+    a, b = aliased(OrderItem), aliased(OrderItem)
+    pairs = db.select(a.product_id, b.product_id, db.func.count(db.distinct(a.order_id)))\
+        .join(b, db.and_(b.order_id == a.order_id, b.product_id != a.product_id))\
+        .join(Order, Order.id == a.order_id).where(Order.status != 'cancelled')\
+        .group_by(a.product_id, b.product_id)
+    db.session.execute(insert(ProductPair).from_select(['product_id', 'other_id', 'orders'], pairs))
+    db.session.execute(update(Order).values(copurchases_recorded=Order.status != 'cancelled')
+                       .execution_options(synchronize_session=False))
+
+    # Đọc theo luồng, chỉ giữ k cặp đầu mỗi sản phẩm
+    top = {}
+    for product_id, other_id in db.session.query(ProductPair.product_id, ProductPair.other_id)\
+            .order_by(ProductPair.product_id, ProductPair.orders.desc(), ProductPair.other_id).yield_per(5000):
+        related = top.setdefault(product_id, [])
+        if len(related) < k:
+            related.append(other_id)
+    newest = {}
+    for product_id, category_id in db.session.query(Product.id, Product.category_id)\
+            .filter(Product.category_id.isnot(None))\
+            .order_by(Product.created_at.desc(), Product.id.desc()).yield_per(5000):
+        ids = newest.setdefault(category_id, [])
+        if len(ids) <= k:
+            ids.append(product_id)
+
+    rows = []
+    for product_id, category_id in db.session.query(Product.id, Product.category_id).yield_per(5000):
+        related = top.get(product_id, [])
+        related += [p for p in newest.get(category_id, []) if p != product_id and p not in related][:k - len(related)]
+        rows.append({'product_id': product_id, 'related_ids': ','.join(map(str, related))})
+    for batch in importer.batched(rows, 5000):
+        db.session.execute(insert(RelatedProducts), batch)
+    return len(rows)
+
+def upgrade_database(log=None):
+    """
+    One-shot schema setup: apply pending migrations, create the full-text
+    index and fill derived tables that are still empty. Run it at deploy
+    (`flask db-upgrade`) rather than on every worker start.
+    Args:
+        log: callable for progress messages (e.g. print)
+    Returns:
+        list of (version, name) migrations applied
+    """
+    applied = migrations.upgrade(db.engine, db.metadata, log=log)
+    # Tạo bảng tìm kiếm FTS5 và nạp dữ liệu lần đầu
+    if search.ensure_search_index(db.session):
+        search.rebuild_search_index(db.session, Product.query.yield_per(1000))
+    # Lần chạy đầu sau khi thêm bảng metric: tính số liệu từ dữ liệu sẵn có
+    if Metric.query.count() < len(METRIC_NAMES):
+        rebuild_metrics()
+    if not DailySales.query.first() and Order.query.first():
+        rebuild_sales_rollups()
+    if not RelatedProducts.query.first() and Product.query.first():
+        rebuild_recommendations()
+    db.session.commit()
+    return applied
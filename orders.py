@@ -0,0 +1,153 @@
+"""
+Stock reservations and order placement: stock is taken with conditional
+UPDATEs (inventory.change_stock) so concurrent checkouts never oversell.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+
+import inventory
+from extensions import db
+from models import (CartItem, Order, OrderItem, Product, StockReservation, User, increment_metric, order_summary,
+                    record_sale)
+from tasks import job_queue
+
+class OutOfStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+def _release(reservations):
+    released = 0
+    for reservation in reservations:
+        # Chỉ trả hàng về kho nếu chính request này xóa được bản ghi giữ hàng
+        deleted = db.session.execute(
+            delete(StockReservation).where(StockReservation.id == reservation.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deleted:
+            inventory.adjust_stock(reservation.product_id, reservation.quantity, 'release')
+            released += 1
+    return released
+
+def release_expired_reservations():
+    """
+    Returns:
+        int: how many expired holds were given back to stock
+    """
+    return _release(StockReservation.query.filter(StockReservation.expires_at < datetime.utcnow()).all())
+
+def reserve_cart(user_id, cart_items, minutes):
+    """
+    Hold stock for every cart line the user can still get. An unexpired hold that
+    still matches its cart line is kept as is; the rest are released and taken
+    again, and a job is queued to sweep the new holds once they expire.
+    """
+    needed = {}
+    for item in cart_items:
+        needed[item.product_id] = needed.get(item.product_id, 0) + item.quantity
+    now = datetime.utcnow()
+    kept, stale = set(), []
+    for reservation in StockReservation.query.filter_by(user_id=user_id).order_by(StockReservation.product_id):
+        if reservation.expires_at > now and reservation.quantity == needed.get(reservation.product_id) \
+                and reservation.product_id not in kept:
+            kept.add(reservation.product_id)
+        else:
+            stale.append(reservation)
+    _release(stale)
+    expires_at = now + timedelta(minutes=minutes)
+    held = []
+    for product_id in sorted(set(needed) - kept):
+        if inventory.adjust_stock(product_id, -needed[product_id], 'reservation'):
+            held.append({'user_id': user_id, 'product_id': product_id,
+                         'quantity': needed[product_id], 'expires_at': expires_at})
+    if held:
+        db.session.execute(insert(StockReservation), held)
+        job_queue.enqueue('release_reservations', delay=minutes * 60 + 1)
+    return bool(stale or held)
+
+def place_order(user_id, cart_items, shipping_address, phone, note):
+    """
+    Turn the cart into an order in a single transaction
+    Raises:
+        OutOfStock: a line can no longer be covered; nothing is written
+    Returns:
+        Order: the committed order
+    """
+    try:
+        release_expired_reservations()
+        held = {}
+        for reservation in StockReservation.query.filter_by(user_id=user_id):
+            held[reservation.product_id] = held.get(reservation.product_id, 0) + reservation.quantity
+        needed = {}
+        for item in cart_items:
+            needed[item.product_id] = needed.get(item.product_id, 0) + item.quantity
+
+        # Khóa theo thứ tự product_id để các giao dịch song song không deadlock
+        stocks = {}
+        for product_id in sorted(set(held) | set(needed)):
+            stocks[product_id] = inventory.change_stock(product_id, held.get(product_id, 0) - needed.get(product_id, 0))
+            if stocks[product_id] is None:
+                raise OutOfStock(product_id)
+        db.session.execute(delete(StockReservation).where(StockReservation.user_id == user_id)
+                           .execution_options(synchronize_session=False))
+
+        order = Order(
+            user_id=user_id,
+            shipping_address=shipping_address,
+            phone=phone,
+            note=note,
+            total_amount=sum(item.product.unit_price * item.quantity for item in cart_items),
+            **order_summary((item.product.name, item.quantity) for item in cart_items)
+        )
+        db.session.add(order)
+        db.session.flush()
+        increment_metric('orders')
+        job_queue.enqueue('update_recommendations', order_id=order.id)
+        # Sổ kho ghi riêng phần trả hàng đang giữ và phần bán; cảnh báo tính theo thay đổi ròng
+        for product_id, stock in stocks.items():
+            released, sold = held.get(product_id, 0), needed.get(product_id, 0)
+            if released:
+                inventory.record(product_id, released, stock + sold, 'release')
+            if sold:
+                inventory.record(product_id, -sold, stock, 'sale', order.id)
+            inventory.watch(product_id, stock - released + sold, stock, 'sale', order.id)
+        db.session.execute(insert(OrderItem), [
+            {'order_id': order.id, 'product_id': item.product_id, 'category_id': item.product.category_id,
+             'quantity': item.quantity, 'price': item.product.unit_price}
+            for item in cart_items
+        ])
+        record_sale(order, [(item.product_id, item.product.category_id, item.quantity, item.product.unit_price)
+                            for item in cart_items])
+        db.session.execute(delete(CartItem).where(CartItem.user_id == user_id))
+        db.session.commit()
+        return order
+    except Exception:
+        db.session.rollback()
+        raise
+
+def order_export_rows(status=None, start=None, end=None):
+    """
+    Stream (order columns + item columns) tuples ordered by order id, fetched
+    from a server-side cursor in chunks so memory stays flat
+    Args:
+        start, end: inclusive date bounds on Order.created_at (UTC)
+    """
+    query = db.select(
+        Order.id, Order.created_at, Order.status, Order.user_id, User.username, Order.total_amount,
+        Order.shipping_address, Order.phone, Order.note,
+        OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.price
+    ).select_from(Order)\
+        .outerjoin(User, User.id == Order.user_id)\
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)\
+        .outerjoin(Product, Product.id == OrderItem.product_id)\
+        .order_by(Order.id, OrderItem.id)
+    if status:
+        query = query.where(Order.status == status)
+    if start:
+        query = query.where(Order.created_at >= start)
+    if end:
+        query = query.where(Order.created_at < end + timedelta(days=1))
+    result = db.session.execute(query.execution_options(stream_results=True, yield_per=1000))
+    for row in result:
+        yield tuple(row)
@@ -0,0 +1,60 @@
+import hashlib
+from functools import wraps
+
+from flask import make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+
+
+def _request_key(prefix):
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    return f'{prefix}:{request.path}?{args}'
+
+
+def cached_page(page_cache, groups=('catalog',)):
+    """
+    Serve whole GET pages to anonymous visitors from page_cache.
+
+    The cache key is the path plus sorted query args; entries belong to `groups`
+    so bumping the catalogue version drops them. Responses carry a strong ETag
+    and a matching If-None-Match gets a 304 without rendering anything.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_function(*args, **kwargs):
+            # Người dùng đã đăng nhập hoặc còn flash message thì render bình thường
+            if request.method != 'GET' or current_user.is_authenticated or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            rendered = {}
+
+            def render():
+                response = make_response(view(*args, **kwargs))
+                rendered['response'] = response
+                if response.status_code != 200:
+                    return None
+                body = response.get_data()
+                return body, response.mimetype, hashlib.sha1(body).hexdigest()
+
+            entry = page_cache.get_or_load(_request_key('page'), render, groups=groups)
+            if entry is None:
+                return rendered['response']
+
+            body, mimetype, etag = entry
+            response = make_response(body)
+            response.mimetype = mimetype
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Cookie')
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
+
+
+def render_fragment(page_cache, name, groups, render):
+    """
+    Cache a piece of rendered HTML shared by every user who would see the same
+    output; `name` must capture whatever makes the fragment differ
+    """
+    html = page_cache.get_or_load(_request_key(f'fragment:{name}'), lambda: str(render()), groups=groups)
+    return Markup(html)
@@ -0,0 +1,139 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# Số đếm ước lượng được giữ lại trong bao lâu (giây) trước khi đếm lại
+COUNT_TTL = 60
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def encode_cursor(created_at, item_id, direction):
+    """
+    Build an opaque cursor token from a (created_at, id) key
+    Args:
+        created_at: datetime of the boundary row
+        item_id: id of the boundary row
+        direction: 'next' (rows after the key) or 'prev' (rows before it)
+    Returns:
+        str: url-safe token
+    Raises:
+        ValueError: created_at is NULL (a token without it would read as the first page)
+    """
+    if created_at is None:
+        raise ValueError(f'Cannot build a cursor for row {item_id} without created_at; run `flask db-upgrade`')
+    payload = json.dumps([created_at.isoformat(), item_id, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Returns:
+        tuple: (created_at, id, direction) or None if the token is missing or invalid
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, item_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            return None
+        return datetime.fromisoformat(created_at), int(item_id), direction
+    except (ValueError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing, newest first"""
+
+    def __init__(self, items, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, model, per_page, cursor=None, total=None):
+    """
+    Page through `query` ordered by (created_at, id) descending without OFFSET
+    Args:
+        query: base query (filters applied, no ordering)
+        model: model with created_at and id columns
+        per_page: page size
+        cursor: token from a previous page's next_cursor/prev_cursor
+        total: optional (estimated) total to expose on the page
+    Returns:
+        KeysetPage
+    """
+    key = decode_cursor(cursor)
+    created_at, item_id = model.created_at, model.id
+
+    if key is None:
+        direction = 'next'
+        rows = query.order_by(created_at.desc(), item_id.desc()).limit(per_page + 1).all()
+    elif key[2] == 'next':
+        direction = 'next'
+        rows = query.filter(or_(
+            created_at < key[0],
+            and_(created_at == key[0], item_id < key[1])
+        )).order_by(created_at.desc(), item_id.desc()).limit(per_page + 1).all()
+    else:
+        direction = 'prev'
+        rows = query.filter(or_(
+            created_at > key[0],
+            and_(created_at == key[0], item_id > key[1])
+        )).order_by(created_at.asc(), item_id.asc()).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = rows[0], rows[-1]
+        if direction == 'next':
+            if has_more:
+                next_cursor = encode_cursor(last.created_at, last.id, 'next')
+            if key is not None:
+                prev_cursor = encode_cursor(first.created_at, first.id, 'prev')
+        else:
+            next_cursor = encode_cursor(last.created_at, last.id, 'next')
+            if has_more:
+                prev_cursor = encode_cursor(first.created_at, first.id, 'prev')
+    return KeysetPage(rows, next_cursor, prev_cursor, total)
+
+
+def estimated_count(cache_key, query, ttl=COUNT_TTL):
+    """
+    COUNT(*) for `query`, recomputed at most once every `ttl` seconds per cache_key
+    """
+    now = time.monotonic()
+    with _count_lock:
+        cached = _count_cache.get(cache_key)
+        if cached and now - cached[1] < ttl:
+            return cached[0]
+    value = query.order_by(None).count()
+    with _count_lock:
+        _count_cache[cache_key] = (value, now)
+    return value
+
+
+def invalidate_counts(prefix=''):
+    """Forget cached counts whose key starts with prefix"""
+    with _count_lock:
+        for cache_key in [k for k in _count_cache if k.startswith(prefix)]:
+            del _count_cache[cache_key]
@@ -0,0 +1,90 @@
+"""
+Password hashing off the request thread.
+
+Hashing is deliberately slow, so PasswordHasher runs werkzeug's
+generate_password_hash / check_password_hash in a small process pool (CPU
+work there does not hold the GIL of the web worker). The number of hashes
+waiting or running is capped; past the cap, callers get HasherBusy at once
+instead of piling up behind each other.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Too many hashes are already queued"""
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt:32768:8:1', workers=2, max_pending=32, timeout=10):
+        """
+        Args:
+            method: werkzeug hash method, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'
+            workers: hashing processes; 0 hashes inline in the calling thread
+            max_pending: hashes allowed in flight (queued or running) at once
+            timeout: seconds to wait for a queued hash before giving up
+        """
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._prefix = None
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # Không dùng fork: pool được tạo lúc đăng nhập lần đầu, khi các luồng job/profiler
+                    # có thể đang giữ lock (SQLite, logging, pool kết nối) và tiến trình con bị treo.
+                    # Hàm băm nằm ở cấp module nên tiến trình forkserver/spawn tự import được.
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        if not self.workers:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Trả chỗ khi hash thật sự xong (hoặc bị hủy), không phải khi người gọi thôi chờ:
+        # hash quá hạn vẫn chiếm pool nên vẫn phải tính vào max_pending
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash or password is None:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with a different method or parameters than the current ones"""
+        if self._prefix is None:
+            # werkzeug điền tham số mặc định (vd. số vòng pbkdf2) nên lấy tiền tố từ một hash thật
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
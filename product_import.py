@@ -0,0 +1,159 @@
+"""
+Bulk product import from CSV/JSONL (admin upload and `flask import-products`).
+"""
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import insert, update
+from werkzeug.datastructures import MultiDict
+
+import importer
+import inventory
+import search
+from catalog import invalidate_all_products_cache
+from extensions import db
+from forms import ProductForm
+from models import Category, Product, increment_metric
+from tasks import job_queue
+
+IMPORT_FIELDS = ('name', 'price', 'stock', 'category_id', 'description')
+
+def _import_form(categories):
+    form = ProductForm(formdata=None, meta={'csrf': False})
+    form.category_id.choices = [(c, '') for c in categories.values()]
+    return form
+
+def _import_values(row, categories, form):
+    """
+    Validate one import row with the same rules as ProductForm
+    (the form is built once per import and re-filled for every row)
+    Returns:
+        (values, image_source) or raises ValueError with the validation message
+    """
+    row = {k: '' if v is None else str(v).strip() for k, v in row.items()}
+    if not row.get('category_id') and row.get('category'):
+        category_id = categories.get(row['category'].lower())
+        if category_id is None:
+            raise ValueError(f"Danh mục không tồn tại: {row['category']}")
+        row['category_id'] = str(category_id)
+    form.process(formdata=MultiDict(row))
+    if not form.validate():
+        raise ValueError('; '.join(f'{field}: {", ".join(errors)}' for field, errors in form.errors.items()))
+    values = {field: getattr(form, field).data for field in IMPORT_FIELDS}
+    # Ô sale_price để trống thì bỏ giá khuyến mãi (như form sửa sản phẩm); chỉ giữ giá cũ khi file không có cột này
+    if 'sale_price' in row:
+        values['sale_price'] = float(row['sale_price']) if row['sale_price'] else None
+    if row.get('id'):
+        values['id'] = int(row['id'])
+    return values, row.get('image') or None
+
+def _resolve_image_source(source, images_dir):
+    """Only URLs, or files inside images_dir, may be attached during import"""
+    if not source:
+        return None
+    if source.startswith(('http://', 'https://')):
+        return source
+    if images_dir:
+        root = os.path.realpath(images_dir)
+        path = os.path.realpath(os.path.join(root, source))
+        if path.startswith(root + os.sep) and os.path.isfile(path):
+            return path
+    raise ValueError(f'Không tìm thấy ảnh: {source}')
+
+def _import_batch(batch, categories, form, report, images_dir):
+    valid = []
+    for line_number, row in batch:
+        report.rows += 1
+        if row is None:
+            report.error(line_number, 'Dòng không hợp lệ')
+            continue
+        try:
+            values, image = _import_values(row, categories, form)
+            valid.append((line_number, values, _resolve_image_source(image, images_dir)))
+        except ValueError as e:
+            report.error(line_number, str(e))
+    if not valid:
+        return
+
+    # Sản phẩm đã có: khớp theo id, hoặc theo tên trong cùng danh mục
+    ids = [values['id'] for _, values, _ in valid if 'id' in values]
+    existing_ids = {pid for pid, in db.session.query(Product.id).filter(Product.id.in_(ids))} if ids else set()
+    names = {values['name'] for _, values, _ in valid}
+    by_name = {(name, category_id): pid for pid, name, category_id in
+               db.session.query(Product.id, Product.name, Product.category_id).filter(Product.name.in_(names))}
+
+    # Nhiều dòng cùng một sản phẩm trong một lô: dòng sau thắng, các dòng trước được báo lỗi
+    updates, inserts, lines = {}, {}, {}
+    for line_number, values, image in valid:
+        pid = values.pop('id', None)
+        if pid not in existing_ids:
+            pid = by_name.get((values['name'], values['category_id']))
+        key = pid if pid is not None else (values['name'], values['category_id'])
+        if key in lines:
+            report.error(lines[key], f'Trùng sản phẩm với dòng {line_number}, dòng sau được dùng')
+        lines[key] = line_number
+        if pid is not None:
+            updates[pid] = ({**values, 'id': pid, 'updated_at': datetime.utcnow()}, image)
+        else:
+            inserts[(values['name'], values['category_id'])] = (values, image)
+
+    try:
+        if updates:
+            old_stock = dict(db.session.query(Product.id, Product.stock).filter(Product.id.in_(updates)))
+            db.session.execute(update(Product), [{k: v for k, v in values.items() if k != 'stock'}
+                                                 for values, _ in updates.values()])
+            # Tồn kho đổi theo chênh lệch qua inventory (UPDATE có điều kiện), nên hàng bán giữa lúc
+            # đọc old_stock và lúc ghi vẫn được giữ và sổ kho luôn khớp; theo thứ tự product_id như khi đặt hàng
+            for pid in sorted(updates):
+                delta = updates[pid][0]['stock'] - old_stock[pid]
+                if delta and not inventory.adjust_stock(pid, delta, 'import'):
+                    raise ValueError(f'Tồn kho sản phẩm #{pid} vừa thay đổi, vui lòng nhập lại')
+        new_ids = []
+        if inserts:
+            new_ids = db.session.scalars(
+                insert(Product).returning(Product.id, sort_by_parameter_order=True),
+                [values for values, _ in inserts.values()]
+            ).all()
+        touched = list(zip(new_ids, inserts.values())) + list(updates.items())
+        search.index_products(db.session, [
+            SimpleNamespace(id=pid, name=values['name'], description=values['description'])
+            for pid, (values, _) in touched
+        ])
+        for pid, (values, image) in touched:
+            if image:
+                job_queue.enqueue('attach_image', product_id=pid, source=image)
+                report.images_queued += 1
+        for pid, (values, _) in zip(new_ids, inserts.values()):
+            inventory.record(pid, values['stock'], values['stock'], 'initial')
+            inventory.watch(pid, 0, values['stock'], 'initial', alert=False)
+        increment_metric('products', len(new_ids))
+        db.session.commit()
+        report.inserted += len(new_ids)
+        report.updated += len(updates)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error importing batch: {str(e)}")
+        for line_number in lines.values():
+            report.error(line_number, f'Lỗi ghi CSDL: {e}')
+
+def import_products(stream, fmt, batch_size=1000, images_dir=None):
+    """
+    Stream products from a CSV/JSONL file into the catalogue, upserting in
+    batched transactions
+    Args:
+        stream: file object (binary or text)
+        fmt: 'csv' or 'jsonl'
+        batch_size: rows per transaction
+        images_dir: directory local image paths are resolved against (None = URLs only)
+    Returns:
+        importer.ImportReport
+    """
+    report = importer.ImportReport()
+    categories = {name.strip().lower(): cid for cid, name in db.session.query(Category.id, Category.name)}
+    form = _import_form(categories)
+    for batch in importer.batched(importer.read_rows(stream, fmt), batch_size):
+        _import_batch(batch, categories, form, report, images_dir)
+    invalidate_all_products_cache()
+    return report.finish()
@@ -0,0 +1,323 @@
+"""
+Per-request instrumentation.
+
+install() adds SQLAlchemy engine events and Flask hooks that record, for each
+request, wall time, SQL statement count and time, template render time and
+the slowest statements. The numbers go out as a Server-Timing header, feed
+process-wide Prometheus counters (render_metrics) and, when a request is
+slower than SLOW_REQUEST_MS, a log line with its slowest statements.
+
+SamplingProfiler periodically samples the stacks of threads that are
+serving a request and counts collapsed stacks (flamegraph format). It only
+runs when PROFILER_ENABLED is set, so it costs nothing otherwise.
+"""
+import heapq
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+# Các mốc của histogram thời gian xử lý request (giây)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOWEST_PER_REQUEST = 3
+SLOWEST_OVERALL = 20
+STATEMENT_PREVIEW = 300
+
+
+class Registry:
+    """Process-wide request counters, keyed by (endpoint, method)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}      # (endpoint, method, status) -> count
+        self.durations = {}     # (endpoint, method) -> [bucket counts..., sum, count]
+        self.sql = {}           # endpoint -> [statements, seconds]
+        self.templates = {}     # endpoint -> seconds
+        self.segments = {}      # (endpoint, name) -> seconds
+        self.slowest = []       # min-heap of (seconds, statement, endpoint)
+
+    def observe(self, endpoint, method, status, seconds, sql_count, sql_time, template_time,
+                segments, slowest):
+        with self.lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.durations.setdefault((endpoint, method), [0] * (len(DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            sql = self.sql.setdefault(endpoint, [0, 0.0])
+            sql[0] += sql_count
+            sql[1] += sql_time
+            self.templates[endpoint] = self.templates.get(endpoint, 0.0) + template_time
+            for name, value in segments.items():
+                self.segments[(endpoint, name)] = self.segments.get((endpoint, name), 0.0) + value
+            for duration, statement in slowest:
+                item = (duration, statement, endpoint)
+                if len(self.slowest) < SLOWEST_OVERALL:
+                    heapq.heappush(self.slowest, item)
+                elif duration > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, item)
+
+    def slowest_statements(self):
+        with self.lock:
+            items = sorted(self.slowest, reverse=True)
+        return [{'ms': round(duration * 1000, 2), 'endpoint': endpoint, 'statement': statement}
+                for duration, statement, endpoint in items]
+
+
+registry = Registry()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_metrics(extra=None):
+    """
+    Prometheus text exposition of the request counters
+    Args:
+        extra: optional dict of gauge name -> value to append (e.g. cache sizes)
+    """
+    lines = []
+    with registry.lock:
+        lines += ['# HELP http_requests_total Requests handled, by endpoint, method and status',
+                  '# TYPE http_requests_total counter']
+        for (endpoint, method, status), count in sorted(registry.requests.items()):
+            lines.append(f'http_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+
+        lines += ['# HELP http_request_duration_seconds Request wall time',
+                  '# TYPE http_request_duration_seconds histogram']
+        for (endpoint, method), histogram in sorted(registry.durations.items()):
+            labels = f'endpoint="{_label(endpoint)}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram[-2]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram[-1]}')
+
+        lines += ['# HELP sql_statements_total SQL statements executed while handling requests',
+                  '# TYPE sql_statements_total counter']
+        for endpoint, (count, _) in sorted(registry.sql.items()):
+            lines.append(f'sql_statements_total{{endpoint="{_label(endpoint)}"}} {count}')
+        lines += ['# HELP sql_duration_seconds_total Time spent in SQL statements',
+                  '# TYPE sql_duration_seconds_total counter']
+        for endpoint, (_, seconds) in sorted(registry.sql.items()):
+            lines.append(f'sql_duration_seconds_total{{endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+
+        lines += ['# HELP template_render_seconds_total Time spent rendering Jinja templates',
+                  '# TYPE template_render_seconds_total counter']
+        for endpoint, seconds in sorted(registry.templates.items()):
+            lines.append(f'template_render_seconds_total{{endpoint="{_label(endpoint)}"}} {seconds:.6f}')
+
+        if registry.segments:
+            lines += ['# HELP request_segment_seconds_total Time spent in named code sections',
+                      '# TYPE request_segment_seconds_total counter']
+            for (endpoint, name), seconds in sorted(registry.segments.items()):
+                lines.append(f'request_segment_seconds_total{{endpoint="{_label(endpoint)}",'
+                             f'segment="{_label(name)}"}} {seconds:.6f}')
+
+    for name, value in sorted((extra or {}).items()):
+        lines += [f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name` segment"""
+    if not has_request_context() or 'profile_started' not in g:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        segments = g.profile_segments
+        segments[name] = segments.get(name, 0.0) + time.perf_counter() - started
+
+
+def install(app, engines):
+    """Instrument `app` and the given SQLAlchemy engines (call once at startup)"""
+    profiler = SamplingProfiler(app.config.get('PROFILER_INTERVAL', 0.005))
+    app.extensions['profiler'] = profiler
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+        event.listen(engine, 'handle_error', _execute_failed)
+    template_rendered.connect(_template_rendered, app)
+    before_render_template.connect(_before_render_template, app)
+
+    @app.before_request
+    def start_profile():
+        g.profile_started = time.perf_counter()
+        g.profile_sql_count = 0
+        g.profile_sql_time = 0.0
+        g.profile_slowest = []
+        g.profile_template_time = 0.0
+        g.profile_template_stack = []
+        g.profile_segments = {}
+        if app.config.get('PROFILER_ENABLED'):
+            profiler.start()
+            profiler.track(threading.get_ident())
+
+    @app.after_request
+    def finish_profile(response):
+        if 'profile_started' not in g:
+            return response
+        elapsed = time.perf_counter() - g.profile_started
+        endpoint = request.endpoint or 'unmatched'
+        slowest = sorted(g.profile_slowest, reverse=True)
+        registry.observe(endpoint, request.method, response.status_code, elapsed,
+                         g.profile_sql_count, g.profile_sql_time, g.profile_template_time,
+                         g.profile_segments, slowest)
+
+        if app.config.get('SERVER_TIMING'):
+            timings = [f'app;dur={elapsed * 1000:.1f}',
+                       f'db;dur={g.profile_sql_time * 1000:.1f};desc="{g.profile_sql_count} queries"',
+                       f'tpl;dur={g.profile_template_time * 1000:.1f}']
+            timings += [f'{name};dur={value * 1000:.1f}' for name, value in g.profile_segments.items()]
+            response.headers.add('Server-Timing', ', '.join(timings))
+
+        slow_ms = app.config.get('SLOW_REQUEST_MS')
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            details = '; '.join(f'{duration * 1000:.1f}ms {statement}' for duration, statement in slowest)
+            app.logger.warning(
+                f'Slow request {request.method} {request.path}: {elapsed * 1000:.1f}ms, '
+                f'{g.profile_sql_count} queries ({g.profile_sql_time * 1000:.1f}ms), '
+                f'templates {g.profile_template_time * 1000:.1f}ms; slowest: {details}')
+        return response
+
+    @app.teardown_request
+    def stop_tracking(exc):
+        if app.config.get('PROFILER_ENABLED'):
+            profiler.untrack(threading.get_ident())
+
+    return profiler
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['profile_started'].pop()
+    if not has_request_context() or 'profile_started' not in g:
+        return
+    duration = time.perf_counter() - started
+    g.profile_sql_count += 1
+    g.profile_sql_time += duration
+    slowest = g.profile_slowest
+    if len(slowest) < SLOWEST_PER_REQUEST:
+        heapq.heappush(slowest, (duration, _preview(statement)))
+    elif duration > slowest[0][0]:
+        heapq.heapreplace(slowest, (duration, _preview(statement)))
+
+
+def _preview(statement):
+    return ' '.join(statement.split())[:STATEMENT_PREVIEW]
+
+
+def _execute_failed(context):
+    if context.connection is not None:
+        stack = context.connection.info.get('profile_started')
+        if stack:
+            stack.pop()
+
+
+def _before_render_template(sender, template, context, **extra):
+    if 'profile_started' in g:
+        g.profile_template_stack.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    if 'profile_started' not in g or not g.profile_template_stack:
+        return
+    started = g.profile_template_stack.pop()
+    # Template lồng nhau (fragment) đã nằm trong thời gian của template ngoài
+    if not g.profile_template_stack:
+        g.profile_template_time += time.perf_counter() - started
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of request-serving threads every `interval`
+    seconds and counts how often each collapsed stack is seen
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.threads = set()
+        self.stacks = {}
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def track(self, ident):
+        with self.lock:
+            self.threads.add(ident)
+
+    def untrack(self, ident):
+        with self.lock:
+            self.threads.discard(ident)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self.lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def reset(self):
+        with self.lock:
+            self.stacks = {}
+            self.samples = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.lock:
+                threads = set(self.threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            collected = []
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    collected.append(self._collapse(frame))
+            with self.lock:
+                for stack in collected:
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += len(collected)
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self, limit=None):
+        """Stacks in collapsed format ('a;b;c count'), most frequent first"""
+        with self.lock:
+            items = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)
+        if limit:
+            items = items[:limit]
+        return '\n'.join(f'{stack} {count}' for stack, count in items) + '\n'
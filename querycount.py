@@ -0,0 +1,46 @@
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def install(app, engines):
+    """
+    Count SQL statements per request, on every given engine (primary and read
+    engine), and check them against each view's budget.
+    Budgets are enforced (raise) when app.config['ENFORCE_QUERY_BUDGETS'] is set,
+    which defaults to app.testing; otherwise an overrun is only logged.
+    """
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count_query)
+
+    @app.after_request
+    def check_query_budget(response):
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        used = g.get('query_count', 0)
+        if budget is not None and used > budget:
+            message = f'{request.endpoint} issued {used} SQL queries (budget {budget})'
+            if current_app.config.get('ENFORCE_QUERY_BUDGETS', current_app.testing):
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a view may issue per request"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.query_budget = max_queries
+        return decorated_function
+    return decorator
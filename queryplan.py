@@ -0,0 +1,80 @@
+"""
+EXPLAIN QUERY PLAN helpers for the SQL the hot routes run (`flask
+check-query-plans`, tests/test_query_plans.py).
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+def problems(details, lookup_tables=()):
+    """
+    Report the full-table SCAN steps (SCAN without USING ... INDEX) on tables that
+    are not in lookup_tables, and sorts through a temporary B-tree
+    Args:
+        details: EXPLAIN QUERY PLAN detail strings of one statement
+        lookup_tables: small tables read whole on purpose (e.g. every category for
+            the menu); a statement whose plan starts by scanning one is not reported
+    Returns:
+        list of the offending detail strings
+    """
+    lookup_scans = {f'SCAN {table}' for table in lookup_tables}
+    if details and details[0] in lookup_scans:
+        return []
+    return [d for d in details
+            if (d.startswith('SCAN ') and ' USING ' not in d and d not in lookup_scans) or 'TEMP B-TREE' in d]
+
+
+def explain_sql(connection, statement, parameters=()):
+    """EXPLAIN QUERY PLAN for SQL captured at the DBAPI level (SQLite only)"""
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', tuple(parameters or ()))
+    return [row[-1] for row in rows]
+
+
+@contextmanager
+def capture_selects(engines):
+    """
+    Record the SELECT statements run on `engines` inside the block
+    Yields:
+        list of (statement, parameters), filled as queries run
+    """
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield captured
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', record)
+
+
+def route_plans(app, engines, method, path, user_id=None, data=None):
+    """
+    Request a route with the test client and EXPLAIN every SELECT it ran
+    Args:
+        engines: the app's engines (primary and read engine, if any)
+        user_id: log the request in as this user
+    Returns:
+        (response status code, list of (statement, plan details))
+    """
+    client = app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    # App context mới cho mỗi request: g (số query, user đăng nhập) và session không dính từ request trước
+    with app.app_context(), capture_selects(engines) as captured:
+        response = client.open(path, method=method, data=data)
+    plans, seen = [], set()
+    with engines[0].connect() as connection:
+        for statement, parameters in captured:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            plans.append((statement, explain_sql(connection, statement, parameters)))
+    return response.status_code, plans
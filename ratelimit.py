@@ -0,0 +1,46 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets keyed by string (e.g. 'user:alice', 'ip:1.2.3.4').
+
+    A bucket holds up to `capacity` tokens and refills at capacity/period per
+    second; each attempt takes one token. Only the `maxsize` most recently used
+    keys are kept, so a flood of distinct keys cannot grow memory without bound
+    (an evicted key simply starts again with a full bucket).
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period):
+        """
+        Take one token from `key`'s bucket
+        Returns:
+            0 if allowed, otherwise the seconds until a token is available
+        """
+        if not capacity:
+            return 0
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
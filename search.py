@@ -0,0 +1,139 @@
+import re
+import unicodedata
+
+from sqlalchemy import Float, Integer, text
+
+# Bảng FTS5 lưu tên/mô tả sản phẩm đã bỏ dấu, rowid = product.id
+SEARCH_TABLE = 'product_search'
+# Trọng số bm25: khớp ở tên quan trọng hơn khớp ở mô tả
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_text(value):
+    """
+    Lowercase and strip Vietnamese diacritics so 'Áo sơ mi' and 'ao so mi' match
+    Args:
+        value: raw text (may be None)
+    Returns:
+        str: folded text
+    """
+    if not value:
+        return ''
+    value = value.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', value)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.lower()
+
+
+def build_match_query(search_query):
+    """
+    Turn user input into an FTS5 MATCH expression with prefix matching on every term
+    Returns:
+        str: MATCH expression, or None if the input has no searchable terms
+    """
+    tokens = _TOKEN_RE.findall(fold_text(search_query))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def is_supported(session):
+    return session.get_bind().dialect.name == 'sqlite'
+
+
+def ensure_search_index(session):
+    """
+    Create the FTS5 table if needed
+    Returns:
+        bool: True if the table was just created and must be filled
+    """
+    if not is_supported(session):
+        return False
+    exists = session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first()
+    if exists:
+        return False
+    session.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+    ))
+    # Đặt bm25 có trọng số làm cột rank mặc định để ORDER BY rank dùng được luôn
+    session.execute(text(
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) "
+        f"VALUES ('rank', 'bm25({NAME_WEIGHT}, {DESCRIPTION_WEIGHT})')"
+    ))
+    return True
+
+
+def index_product(session, product):
+    """Insert or refresh one product in the search index (call before commit)"""
+    if not is_supported(session):
+        return
+    remove_product(session, product.id)
+    session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) VALUES (:id, :name, :description)"),
+        {'id': product.id, 'name': fold_text(product.name), 'description': fold_text(product.description)}
+    )
+
+
+def index_products(session, products):
+    """Batch version of index_product: one DELETE and one INSERT for all products"""
+    if not is_supported(session):
+        return
+    rows = [{'id': p.id, 'name': fold_text(p.name), 'description': fold_text(p.description)}
+            for p in products]
+    if not rows:
+        return
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), rows)
+    session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE}(rowid, name, description) VALUES (:id, :name, :description)"),
+        rows
+    )
+
+
+def remove_product(session, product_id):
+    if not is_supported(session):
+        return
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), {'id': product_id})
+
+
+def rebuild_search_index(session, products):
+    """Drop every indexed row and re-index the given products"""
+    if not is_supported(session):
+        return 0
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    count = 0
+    for product in products:
+        index_product(session, product)
+        count += 1
+    session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    return count
+
+
+def apply_search(query, model, search_query):
+    """
+    Restrict a Product query to search hits, best matches first
+    Args:
+        query: Product query to filter
+        model: the Product model
+        search_query: raw text typed by the user
+    Returns:
+        query filtered and ordered by relevance
+    """
+    match = build_match_query(search_query)
+    if match is None:
+        return query
+    if not is_supported(query.session):
+        # Không có FTS5 (vd. PostgreSQL): quay về quét ILIKE trên tên và mô tả
+        pattern = f'%{search_query}%'
+        return query.filter(model.name.ilike(pattern) | model.description.ilike(pattern))
+    hits = text(
+        f"SELECT rowid AS product_id, rank FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH :match"
+    ).bindparams(match=match).columns(product_id=Integer, rank=Float).subquery('search_hits')
+    return query.join(hits, hits.c.product_id == model.id).order_by(hits.c.rank, model.id)
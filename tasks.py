@@ -0,0 +1,106 @@
+"""
+Background job handlers (see jobs.JobQueue); bound to an app in create_app().
+"""
+import io
+import os
+import urllib.request
+
+from flask import current_app
+from sqlalchemy import update
+from werkzeug.datastructures import FileStorage
+
+import images
+import jobs
+import search
+from catalog import delete_image, invalidate_product_cache, save_image
+from extensions import db, page_cache
+from models import Job, Order, OrderItem, Product, record_copurchases, refresh_related_products
+
+job_queue = jobs.JobQueue(db, Job)
+
+@job_queue.task('process_image')
+def process_image_job(product_id, staged_filename):
+    """Run a staged upload through the image pipeline and attach it to the product"""
+    path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'incoming', staged_filename)
+    with open(path, 'rb') as f:
+        extension = staged_filename.rsplit('.', 1)[1]
+        image_url = images.process_image(f.read(), extension, current_app.config['UPLOAD_FOLDER'])
+    product = db.session.get(Product, product_id)
+    if image_url and product:
+        old_image_url = product.image_url
+        product.image_url = image_url
+        db.session.commit()
+        invalidate_product_cache(product_id)
+        if old_image_url != image_url:
+            delete_image(old_image_url)
+    elif not image_url:
+        current_app.logger.error(f"Uploaded image for product {product_id} is not a valid image")
+    os.remove(path)
+
+@job_queue.task('attach_image')
+def attach_image_job(product_id, source):
+    """Fetch an image from a URL or local path and run it through save_image()"""
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=30) as response:
+            data = response.read(current_app.config['MAX_CONTENT_LENGTH'] + 1)
+    else:
+        with open(source, 'rb') as f:
+            data = f.read(current_app.config['MAX_CONTENT_LENGTH'] + 1)
+    if len(data) > current_app.config['MAX_CONTENT_LENGTH']:
+        raise ValueError(f'Image too large: {source}')
+    filename = source.rstrip('/').rsplit('/', 1)[-1].split('?', 1)[0] or 'image.jpg'
+    image_url = save_image(FileStorage(stream=io.BytesIO(data), filename=filename))
+    product = db.session.get(Product, product_id)
+    if not image_url or not product:
+        return
+    old_image_url = product.image_url
+    product.image_url = image_url
+    db.session.commit()
+    invalidate_product_cache(product_id)
+    if old_image_url and old_image_url != image_url:
+        delete_image(old_image_url)
+
+@job_queue.task('delete_image')
+def delete_image_job(image_url):
+    delete_image(image_url)
+
+@job_queue.task('rebuild_search_index')
+def rebuild_search_index_job():
+    search.rebuild_search_index(db.session, Product.query.yield_per(1000))
+    db.session.commit()
+
+@job_queue.task('update_recommendations')
+def update_recommendations_job(order_id, sign=None):
+    """
+    Add (or, for a cancelled order, remove) an order's co-purchases and refresh its products' lists.
+    Safe to run more than once: Order.copurchases_recorded is flipped in the same transaction,
+    so a retried or duplicate job finds nothing left to do.
+    Args:
+        sign: ignored (jobs queued by older code); the direction comes from the order's status
+    """
+    order = db.session.get(Order, order_id)
+    if order is None:
+        return
+    wanted = order.status != 'cancelled'
+    # Chỉ một job đổi được cờ; điều kiện theo trạng thái vừa đọc để job cũ chạy muộn không làm ngược
+    changed = db.session.execute(
+        update(Order).where(Order.id == order_id, Order.status == order.status,
+                            Order.copurchases_recorded != wanted)
+        .values(copurchases_recorded=wanted).execution_options(synchronize_session=False)
+    ).rowcount
+    if not changed:
+        return
+    product_ids = [row[0] for row in db.session.query(OrderItem.product_id).filter_by(order_id=order_id)]
+    record_copurchases(product_ids, 1 if wanted else -1)
+    refresh_related_products(set(product_ids))
+    db.session.commit()
+
+@job_queue.task('release_reservations')
+def release_reservations_job():
+    """Give stock held by checkout pages that were left open back once the holds expire"""
+    # orders.py import job_queue từ module này nên chỉ import khi job chạy
+    from orders import release_expired_reservations
+    released = release_expired_reservations()
+    db.session.commit()
+    if released:
+        page_cache.invalidate('stock')
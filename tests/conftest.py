@@ -0,0 +1,69 @@
+"""
+Shared fixtures: one in-memory app per test session, migrated and filled
+with a small benchmarks/datagen data set plus an admin account.
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app  # noqa: E402
+from extensions import db, password_hasher  # noqa: E402
+from models import CartItem, Category, Order, Product, User, upgrade_database  # noqa: E402
+
+TEST_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'READ_DATABASE_URL': None,
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'JOB_WORKERS': 0,
+    'PASSWORD_HASH_WORKERS': 0,
+    'ENFORCE_QUERY_BUDGETS': True,
+}
+
+
+@pytest.fixture(scope='session')
+def app():
+    from benchmarks.datagen import PASSWORD_METHOD, generate
+    from werkzeug.security import generate_password_hash
+
+    app = create_app(TEST_CONFIG)
+    with app.app_context():
+        upgrade_database()
+        generate(users=20, categories=4, products=200, orders=300, carts=10)
+        db.session.add(User(username='admin', email='admin@example.com', is_admin=True,
+                            password=generate_password_hash('pw', method=PASSWORD_METHOD)))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        password_hasher.shutdown()
+
+
+@pytest.fixture(scope='session')
+def ids(app):
+    """Ids of representative rows in the seeded data"""
+    with app.app_context():
+        customer_id = db.session.query(Order.user_id).group_by(Order.user_id)\
+            .order_by(db.func.count().desc()).limit(1).scalar()
+        return {
+            'admin': User.query.filter_by(is_admin=True).first().id,
+            'customer': customer_id,
+            'order': Order.query.filter_by(user_id=customer_id).first().id,
+            'product': Product.query.first().id,
+            'category': Category.query.first().id,
+            'cart_user': CartItem.query.first().user_id,
+            'cart_item': CartItem.query.first().id,
+        }
+
+
+def login(client, user_id):
+    """Log the test client in as user_id without going through the password hash"""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
@@ -0,0 +1,27 @@
+"""
+Cached related-products lists cross categories, so renaming a product must
+refresh the lists of its co-purchase neighbours too.
+"""
+from conftest import login
+
+
+def test_rename_refreshes_related_lists_in_other_categories(app, ids):
+    from models import Product, ProductPair, RelatedProducts, db
+
+    with app.app_context():
+        # Một cặp mua kèm khác danh mục mà danh sách tính sẵn của neighbour có hiện product
+        category = dict(db.session.query(Product.id, Product.category_id))
+        related = {row.product_id: row.related_ids.split(',') for row in RelatedProducts.query}
+        neighbour_id, product_id = next(
+            (n, p) for n, p in db.session.query(ProductPair.product_id, ProductPair.other_id)
+            if category[n] != category[p] and str(p) in related.get(n, ())[:app.config['RELATED_PRODUCTS_SHOWN']])
+        product = db.session.get(Product, product_id)
+        form = {'name': 'Renamed product', 'price': product.price, 'stock': product.stock,
+                'original_stock': product.stock, 'category_id': product.category_id,
+                'description': product.description or ''}
+
+    customer = login(app.test_client(), ids['customer'])
+    assert form['name'] not in customer.get(f'/product/{neighbour_id}').get_data(as_text=True)
+    admin = login(app.test_client(), ids['admin'])
+    assert admin.post(f'/admin/product/edit/{product_id}', data=form).status_code == 302
+    assert form['name'] in customer.get(f'/product/{neighbour_id}').get_data(as_text=True)
@@ -0,0 +1,37 @@
+"""
+Checkout with a cart line whose product has been deleted.
+"""
+from conftest import login
+
+
+def test_checkout_drops_lines_of_deleted_products(app, ids):
+    from models import CartItem, Order, db
+
+    with app.app_context():
+        missing_id = db.session.query(db.func.max(CartItem.product_id)).scalar() + 100000
+        db.session.add(CartItem(user_id=ids['customer'], product_id=missing_id, quantity=1))
+        db.session.commit()
+        orders = Order.query.count()
+
+    client = login(app.test_client(), ids['customer'])
+    response = client.post('/checkout', data={'address': 'x', 'phone': '1', 'note': ''})
+    assert response.status_code == 302
+    assert 'không còn bán' in client.get('/cart').get_data(as_text=True)
+    with app.app_context():
+        assert CartItem.query.filter_by(product_id=missing_id).count() == 0
+        assert Order.query.count() == orders
+
+
+def test_add_to_cart_rejects_non_positive_quantities(app, ids):
+    from models import CartItem, db
+
+    with app.app_context():
+        item = CartItem.query.filter_by(user_id=ids['cart_user']).first()
+        product_id, quantity = item.product_id, item.quantity
+
+    client = login(app.test_client(), ids['cart_user'])
+    for bad in ('-5', '0', 'abc'):
+        assert client.post(f'/cart/add/{product_id}', data={'quantity': bad}).status_code == 302
+    with app.app_context():
+        assert db.session.query(CartItem.quantity)\
+            .filter_by(user_id=ids['cart_user'], product_id=product_id).scalar() == quantity
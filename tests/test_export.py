@@ -0,0 +1,19 @@
+"""
+Order export streaming: the CSV header goes out before any row is read.
+"""
+import export
+
+
+def test_csv_header_is_sent_before_rows_are_read():
+    def rows():
+        raise AssertionError('rows read before the header was sent')
+        yield
+
+    first = next(export.csv_lines(rows()))
+    assert first.strip() == ','.join(export.ORDER_COLUMNS + export.LINE_COLUMNS)
+
+
+def test_csv_lines_keep_every_row():
+    row = (1, None, 'pending', 2, 'bob', 10.0, 'addr', '1', None, 3, 'shirt', 1, 10.0)
+    lines = ''.join(export.csv_lines([row] * (export.CHUNK_ROWS + 1))).splitlines()
+    assert len(lines) == export.CHUNK_ROWS + 2
@@ -0,0 +1,22 @@
+"""
+/metrics is never public: a bearer token when METRICS_TOKEN is set,
+otherwise a logged-in admin.
+"""
+from conftest import login
+
+
+def test_metrics_without_token_is_admin_only(app, ids):
+    assert app.test_client().get('/metrics').status_code == 404
+    assert login(app.test_client(), ids['customer']).get('/metrics').status_code == 404
+    assert login(app.test_client(), ids['admin']).get('/metrics').status_code == 200
+
+
+def test_metrics_with_token_needs_the_bearer_header(app, ids):
+    app.config['METRICS_TOKEN'] = 'secret'
+    try:
+        client = app.test_client()
+        assert client.get('/metrics').status_code == 401
+        assert login(app.test_client(), ids['admin']).get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+    finally:
+        app.config['METRICS_TOKEN'] = None
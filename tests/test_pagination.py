@@ -0,0 +1,16 @@
+"""
+Keyset cursors need a non-NULL created_at: a NULL key used to decode as
+"first page", so the next link looped back to the start.
+"""
+from datetime import datetime
+
+import pytest
+
+import pagination
+
+
+def test_cursor_refuses_null_keys():
+    with pytest.raises(ValueError):
+        pagination.encode_cursor(None, 1, 'next')
+    token = pagination.encode_cursor(datetime(2024, 1, 2), 7, 'next')
+    assert pagination.decode_cursor(token) == (datetime(2024, 1, 2), 7, 'next')
@@ -0,0 +1,45 @@
+"""
+PasswordHasher keeps at most max_pending hashes in flight, including ones
+whose caller already gave up waiting.
+"""
+import time
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+
+
+def slow_hash(seconds):
+    time.sleep(seconds)
+    return 'done'
+
+
+def test_timed_out_hash_keeps_its_slot_until_it_finishes():
+    hasher = PasswordHasher(workers=1, max_pending=1, timeout=0.05)
+    try:
+        with pytest.raises(HasherBusy):
+            hasher._run(slow_hash, 0.5)
+        # Hash đầu vẫn đang chạy trong pool nên chưa được nhận thêm, dù lần này chịu chờ lâu
+        hasher.timeout = 5
+        with pytest.raises(HasherBusy):
+            hasher._run(slow_hash, 0)
+        time.sleep(1)
+        assert hasher._run(slow_hash, 0) == 'done'
+    finally:
+        hasher.shutdown()
+
+
+def test_inline_hashing_releases_its_slot():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=0, max_pending=1)
+    pwhash = hasher.hash('pw')
+    assert hasher.verify(pwhash, 'pw')
+    assert not hasher.verify(pwhash, 'wrong')
+
+
+def test_pool_does_not_fork_the_web_process():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    try:
+        assert hasher.verify(hasher.hash('pw'), 'pw')
+        assert hasher._executor()._mp_context.get_start_method() != 'fork'
+    finally:
+        hasher.shutdown()
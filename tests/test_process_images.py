@@ -0,0 +1,40 @@
+"""
+`flask process-images` moves legacy uploads onto hashed variants: cached
+pages must pick up the new URL and the superseded originals are removed.
+"""
+import io
+import os
+
+from PIL import Image
+
+from conftest import login
+
+
+def test_process_images_refreshes_cache_and_removes_originals(app, ids, tmp_path):
+    from catalog import invalidate_product_cache
+    from commands import process_images_command
+    from models import Product, db
+
+    upload_folder = app.config['UPLOAD_FOLDER']
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    try:
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'red').save(buffer, 'PNG')
+        (tmp_path / 'legacy.png').write_bytes(buffer.getvalue())
+        with app.app_context():
+            db.session.get(Product, ids['product']).image_url = 'legacy.png'
+            db.session.commit()
+            invalidate_product_cache(ids['product'])
+
+        client = login(app.test_client(), ids['customer'])
+        assert 'legacy.png' in client.get(f"/product/{ids['product']}").get_data(as_text=True)
+        result = app.test_cli_runner().invoke(process_images_command)
+        assert 'Converted 1 product images, removed 1 superseded originals' in result.output
+
+        page = client.get(f"/product/{ids['product']}").get_data(as_text=True)
+        with app.app_context():
+            image_url = db.session.get(Product, ids['product']).image_url
+        assert 'legacy.png' not in page and image_url.split('.')[0] in page
+        assert not os.path.exists(tmp_path / 'legacy.png')
+    finally:
+        app.config['UPLOAD_FOLDER'] = upload_folder
@@ -0,0 +1,49 @@
+"""
+Bulk import: every input row ends up inserted, updated or reported.
+"""
+import io
+
+from conftest import login
+
+
+def test_duplicate_rows_in_a_batch_are_reported(app, ids):
+    from models import Product
+
+    csv = (
+        'name,price,stock,category_id\n'
+        f"Import dup,1,5,{ids['category']}\n"
+        f"Import dup,2,6,{ids['category']}\n"
+        f"Import other,3,7,{ids['category']}\n"
+    ).encode()
+    admin = login(app.test_client(), ids['admin'])
+    report = admin.post('/admin/products/import', data={'file': (io.BytesIO(csv), 'products.csv')},
+                        content_type='multipart/form-data', headers={'Accept': 'application/json'}).get_json()
+
+    assert report['rows'] == report['inserted'] + report['updated'] + report['failed'] == 3
+    assert [error['line'] for error in report['errors']] == [2]
+    with app.app_context():
+        assert [(p.price, p.stock) for p in Product.query.filter_by(name='Import dup')] == [(2, 6)]
+
+
+def test_blank_sale_price_ends_the_sale(app, ids):
+    from models import Product, db
+
+    with app.app_context():
+        product = Product.query.filter(Product.category_id.isnot(None)).first()
+        product.sale_price = 5
+        db.session.commit()
+        product_id, category_id = product.id, product.category_id
+
+    def run(data, filename):
+        admin = login(app.test_client(), ids['admin'])
+        return admin.post('/admin/products/import', data={'file': (io.BytesIO(data.encode()), filename)},
+                          content_type='multipart/form-data', headers={'Accept': 'application/json'}).get_json()
+
+    # Không có cột sale_price: giữ giá khuyến mãi
+    assert run(f'id,name,price,stock,category_id\n{product_id},Sale item,10,5,{category_id}\n', 'a.csv')['updated'] == 1
+    with app.app_context():
+        assert db.session.get(Product, product_id).sale_price == 5
+    assert run(f'id,name,price,stock,category_id,sale_price\n{product_id},Sale item,10,5,{category_id},\n',
+               'b.csv')['updated'] == 1
+    with app.app_context():
+        assert db.session.get(Product, product_id).sale_price is None
@@ -0,0 +1,84 @@
+"""
+Every view declared with @query_budget must stay within its budget on
+seeded data. ENFORCE_QUERY_BUDGETS is on, so an overrun raises
+querycount.QueryBudgetExceeded out of the request.
+"""
+import pytest
+
+from conftest import login
+
+# (endpoint, method, path, user); {name} placeholders are filled from the ids fixture
+BUDGETED_REQUESTS = [
+    ('storefront.index', 'GET', '/', 'customer'),
+    ('storefront.index', 'GET', '/?category={category}', 'customer'),
+    ('storefront.product_detail', 'GET', '/product/{product}', 'customer'),
+    ('checkout.view_cart', 'GET', '/cart', 'cart_user'),
+    ('checkout.update_cart', 'POST', '/cart/update/{cart_item}', 'cart_user'),
+    ('checkout.view_orders', 'GET', '/orders', 'customer'),
+    ('checkout.order_detail', 'GET', '/order/{order}', 'customer'),
+    ('admin.admin_dashboard', 'GET', '/admin', 'admin'),
+    ('admin.admin_products', 'GET', '/admin/products', 'admin'),
+    ('admin.admin_orders', 'GET', '/admin/orders', 'admin'),
+    ('admin.admin_orders', 'GET', '/admin/orders?status=pending', 'admin'),
+    ('admin.admin_order_detail', 'GET', '/admin/order/{order}', 'admin'),
+    ('admin.admin_reports', 'GET', '/admin/reports', 'admin'),
+]
+
+
+def test_every_budgeted_view_is_covered(app):
+    budgeted = {endpoint for endpoint, view in app.view_functions.items()
+                if getattr(view, 'query_budget', None) is not None}
+    assert {request[0] for request in BUDGETED_REQUESTS} == budgeted
+
+
+@pytest.mark.parametrize('endpoint,method,path,user', BUDGETED_REQUESTS)
+def test_view_stays_within_budget(app, ids, endpoint, method, path, user):
+    client = login(app.test_client(), ids[user])
+    response = client.open(path.format(**ids), method=method,
+                           data={'quantity': 2} if method == 'POST' else None)
+    assert response.status_code in (200, 302), response.status_code
+
+
+def test_overrun_fails_the_request(app, ids):
+    from querycount import QueryBudgetExceeded
+
+    view = app.view_functions['checkout.view_cart']
+    budget = view.query_budget
+    view.query_budget = 0
+    try:
+        with pytest.raises(QueryBudgetExceeded):
+            login(app.test_client(), ids['cart_user']).get('/cart')
+    finally:
+        view.query_budget = budget
+
+
+def test_queries_on_the_read_engine_count(tmp_path):
+    from werkzeug.security import generate_password_hash
+
+    from app import create_app
+    from conftest import TEST_CONFIG
+    from extensions import db, password_hasher
+    from models import User, upgrade_database
+    from querycount import QueryBudgetExceeded
+
+    app = create_app({**TEST_CONFIG, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'shop.db'}",
+                      'READ_DATABASE_URL': 'primary'})
+    with app.app_context():
+        upgrade_database()
+        user = User(username='reader', email='reader@example.com', password=generate_password_hash('pw'))
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    view = app.view_functions['checkout.view_cart']
+    budget = view.query_budget
+    view.query_budget = 0
+    try:
+        # GET /cart chạy SELECT trên read engine; vẫn phải bị tính vào ngân sách
+        with pytest.raises(QueryBudgetExceeded):
+            login(app.test_client(), user_id).get('/cart')
+    finally:
+        view.query_budget = budget
+        with app.app_context():
+            password_hasher.shutdown()
+            db.engine.dispose()
+            app.extensions['read_engine'].dispose()
@@ -0,0 +1,25 @@
+"""
+The hot routes must not fall back to full table scans or unindexed sorts.
+The plans are taken from the SQL the routes really run (captured while the
+test client requests them), so they cannot drift from the code.
+"""
+import pytest
+
+from commands import HOT_ROUTES, hot_route_plans
+
+
+@pytest.fixture(scope='module')
+def plans(app):
+    with app.app_context():
+        results = hot_route_plans()
+    assert results is not None
+    return {name: (status, statements) for name, status, statements in results}
+
+
+@pytest.mark.parametrize('name', [route[0] for route in HOT_ROUTES])
+def test_hot_route_uses_indexes(plans, name):
+    status, statements = plans[name]
+    assert status in (200, 302), status
+    assert statements, 'route ran no SELECT'
+    failures = [f"{' | '.join(details)}\n    {statement}" for statement, details, bad in statements if bad]
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,35 @@
+"""
+update_recommendations jobs can be retried or run twice without counting an
+order's co-purchases twice.
+"""
+from conftest import login
+
+
+def test_repeated_jobs_count_an_order_once(app, ids):
+    from models import Order, OrderItem, ProductPair, db
+    from tasks import update_recommendations_job
+
+    with app.app_context():
+        order_id = db.session.query(OrderItem.order_id).join(Order, Order.id == OrderItem.order_id)\
+            .filter(Order.status != 'cancelled').group_by(OrderItem.order_id)\
+            .having(db.func.count() > 1).first()[0]
+        a, b = [row[0] for row in db.session.query(OrderItem.product_id).filter_by(order_id=order_id).limit(2)]
+
+    def pair_orders():
+        with app.app_context():
+            return db.session.get(ProductPair, (a, b)).orders
+
+    before = pair_orders()
+    with app.app_context():
+        # Đơn đã được tính lúc dựng dữ liệu: chạy lại job không cộng thêm
+        update_recommendations_job(order_id)
+        update_recommendations_job(order_id)
+    assert pair_orders() == before
+
+    admin = login(app.test_client(), ids['admin'])
+    assert admin.post(f'/admin/order/status/{order_id}', data={'status': 'cancelled'}).status_code == 302
+    with app.app_context():
+        # Job cũ (trước khi sửa) còn mang sign; job bị chạy lại sau khi hết lease
+        update_recommendations_job(order_id, sign=-1)
+        update_recommendations_job(order_id, sign=-1)
+    assert pair_orders() == before - 1
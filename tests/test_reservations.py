@@ -0,0 +1,43 @@
+"""
+Checkout page stock holds: reloading the page keeps matching holds, and holds
+left behind by abandoned carts are released by the queued sweep job.
+"""
+from datetime import datetime, timedelta
+
+from conftest import login
+
+
+def test_reload_keeps_holds_and_sweep_releases_expired(app, ids):
+    from models import CartItem, InventoryMovement, Job, Product, StockReservation, db
+    from tasks import job_queue
+
+    app.config['STOCK_RESERVATION_MINUTES'] = 15
+    try:
+        with app.app_context():
+            cart = dict(db.session.query(CartItem.product_id, CartItem.quantity).filter_by(user_id=ids['cart_user']))
+            stock = dict(db.session.query(Product.id, Product.stock).filter(Product.id.in_(cart)))
+        client = login(app.test_client(), ids['cart_user'])
+
+        assert client.get('/checkout').status_code == 200
+        with app.app_context():
+            holds = dict(db.session.query(StockReservation.product_id, StockReservation.quantity)
+                         .filter_by(user_id=ids['cart_user']))
+            movements = InventoryMovement.query.count()
+        assert holds == {pid: qty for pid, qty in cart.items() if stock[pid] >= qty}
+
+        assert client.get('/checkout').status_code == 200
+        with app.app_context():
+            assert InventoryMovement.query.count() == movements
+
+            db.session.query(StockReservation).filter_by(user_id=ids['cart_user'])\
+                .update({'expires_at': datetime.utcnow() - timedelta(minutes=1)})
+            # Job quét được hẹn chạy lúc hết hạn giữ hàng; cho nó đến hạn ngay
+            db.session.query(Job).filter_by(name='release_reservations', status='queued')\
+                .update({'run_at': datetime.utcnow()})
+            db.session.commit()
+        job_queue.run_pending(app)
+        with app.app_context():
+            assert StockReservation.query.filter_by(user_id=ids['cart_user']).count() == 0
+            assert dict(db.session.query(Product.id, Product.stock).filter(Product.id.in_(cart))) == stock
+    finally:
+        app.config['STOCK_RESERVATION_MINUTES'] = 0
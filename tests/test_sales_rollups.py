@@ -0,0 +1,30 @@
+"""
+Cancelling an order reverses its category sales against the categories the
+products had when it was placed, so the running rollup matches a rebuild.
+"""
+from conftest import login
+
+
+def category_sales(CategorySales):
+    return {row.category_id: (row.units, round(row.revenue, 2)) for row in CategorySales.query}
+
+
+def test_cancel_after_recategorising_matches_rebuild(app, ids):
+    from models import Category, CategorySales, Order, OrderItem, Product, db, rebuild_sales_rollups
+
+    with app.app_context():
+        order_id, product_id, category_id = db.session.query(Order.id, OrderItem.product_id, OrderItem.category_id)\
+            .join(OrderItem, OrderItem.order_id == Order.id)\
+            .filter(Order.status != 'cancelled', OrderItem.category_id.isnot(None)).first()
+        other = Category.query.filter(Category.id != category_id).first().id
+        db.session.get(Product, product_id).category_id = other
+        db.session.commit()
+
+    admin = login(app.test_client(), ids['admin'])
+    assert admin.post(f'/admin/order/status/{order_id}', data={'status': 'cancelled'}).status_code == 302
+    with app.app_context():
+        running = category_sales(CategorySales)
+        rebuild_sales_rollups()
+        rebuilt = category_sales(CategorySales)
+        db.session.rollback()
+    assert running == rebuilt
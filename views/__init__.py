@@ -0,0 +1,3 @@
+"""
+Blueprints registered by app.create_app().
+"""
@@ -0,0 +1,464 @@
+"""
+Admin blueprint: catalogue and order management, reports and diagnostics.
+"""
+from datetime import date, datetime
+from functools import wraps
+
+from flask import (Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template,
+                   request, stream_with_context, url_for)
+from flask_login import current_user
+from sqlalchemy import delete, update
+from sqlalchemy.orm import joinedload, selectinload
+
+import analytics
+import export
+import importer
+import inventory
+import jobs
+import pagination
+import profiling
+import search
+from catalog import (cached_categories, copurchase_neighbours, invalidate_category_cache, invalidate_product_cache,
+                     stage_upload)
+from extensions import catalog_cache, db, page_cache
+from forms import ProductForm
+from models import (Category, CategorySales, DailySales, Job, LowStockProduct, Metric, Order, OrderItem,
+                    Product, ProductPair, ProductSales, RelatedProducts, increment_metric, order_lines,
+                    record_sale)
+from orders import order_export_rows
+from product_import import import_products
+from querycount import query_budget
+from tasks import job_queue
+
+bp = Blueprint('admin', __name__)
+
+# Decorator kiểm tra admin
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.is_admin:
+            flash('Bạn không có quyền truy cập trang này!', 'danger')
+            return redirect(url_for('storefront.index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Routes cho admin
+@bp.route('/admin')
+@query_budget(4)
+@admin_required
+def admin_dashboard():
+    metrics = dict(db.session.query(Metric.name, Metric.value).all())
+    recent_orders = Order.query.options(joinedload(Order.user))\
+        .order_by(Order.created_at.desc()).limit(5).all()
+    low_stock_products = Product.query\
+        .join(LowStockProduct, LowStockProduct.product_id == Product.id)\
+        .order_by(LowStockProduct.stock, LowStockProduct.product_id).limit(50).all()
+    return render_template('admin/dashboard.html',
+                         total_users=metrics.get('users', 0),
+                         total_orders=metrics.get('orders', 0),
+                         total_products=metrics.get('products', 0),
+                         recent_orders=recent_orders,
+                         low_stock_products=low_stock_products)
+
+@bp.route('/admin/products')
+@query_budget(5)
+@admin_required
+def admin_products():
+    cursor = request.args.get('cursor')
+    total = pagination.estimated_count('products', Product.query)
+    products = pagination.keyset_paginate(Product.query.options(joinedload(Product.category)),
+                                          Product, 20, cursor, total=total)
+    categories = cached_categories()
+    
+    return render_template('admin/products.html', 
+                           products=products,
+                           categories=categories)
+
+@bp.route('/admin/product/new', methods=['GET', 'POST'])
+@admin_required
+def admin_new_product():
+    form = ProductForm()
+    form.category_id.choices = [(c.id, c.name) for c in cached_categories()]
+
+    if form.validate_on_submit():
+        try:
+            # Lưu tạm ảnh upload, phần xử lý ảnh chạy trong job nền
+            staged_filename = None
+            if form.image.data:
+                staged_filename = stage_upload(form.image.data)
+                if not staged_filename:
+                    flash('Lỗi khi upload ảnh. Vui lòng kiểm tra định dạng file.', 'error')
+                    return render_template('admin/product_form.html', form=form)
+
+            # Tạo sản phẩm mới
+            new_product = Product(
+                name=form.name.data,
+                price=form.price.data,
+                stock=form.stock.data,
+                category_id=form.category_id.data,
+                description=form.description.data
+            )
+            
+            db.session.add(new_product)
+            db.session.flush()
+            search.index_product(db.session, new_product)
+            increment_metric('products')
+            inventory.record(new_product.id, new_product.stock, new_product.stock, 'initial')
+            inventory.watch(new_product.id, 0, new_product.stock, 'initial', alert=False)
+            if staged_filename:
+                job_queue.enqueue('process_image', product_id=new_product.id,
+                                  staged_filename=staged_filename)
+            db.session.commit()
+            pagination.invalidate_counts('products')
+            invalidate_product_cache(None, new_product.category_id)
+
+            flash('Sản phẩm mới đã được thêm thành công!', 'success')
+            return redirect(url_for('admin.admin_products'))
+            
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error creating product: {str(e)}")
+            flash('Có lỗi xảy ra khi thêm sản phẩm. Vui lòng thử lại.', 'error')
+            
+    return render_template('admin/product_form.html', form=form)
+
+@bp.route('/admin/products/import', methods=['GET', 'POST'])
+@admin_required
+def admin_import_products():
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Vui lòng chọn file CSV hoặc JSONL.', 'danger')
+            return redirect(url_for('admin.admin_import_products'))
+        report = import_products(upload.stream, importer.detect_format(upload.filename))
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(report.as_dict())
+    return render_template('admin/import_products.html', report=report)
+
+@bp.route('/admin/product/edit/<int:product_id>', methods=['GET', 'POST'])
+@admin_required
+def admin_edit_product(product_id):
+    product = Product.query.get_or_404(product_id)  # Fetch the product by ID
+    form = ProductForm(obj=product)  # Prepopulate the form with the product data
+    form.category_id.choices = [(c.id, c.name) for c in cached_categories()]  # Populate categories
+    old_category_id = product.category_id
+    old_name = product.name
+    if not form.is_submitted():
+        form.original_stock.data = product.stock
+
+    if form.validate_on_submit():
+        # Update product attributes with the form data
+        product.name = form.name.data
+        product.description = form.description.data
+        product.price = form.price.data
+        product.category_id = form.category_id.data
+        # Tồn kho đổi theo chênh lệch so với lúc mở form để không ghi đè hàng vừa bán,
+        # và đi qua sổ kho như mọi thay đổi khác
+        original_stock = form.original_stock.data
+        stock_delta = form.stock.data - (product.stock if original_stock is None else original_stock)
+        if stock_delta and not inventory.adjust_stock(product.id, stock_delta, 'adjustment'):
+            db.session.rollback()
+            flash('Tồn kho vừa thay đổi do có đơn hàng mới, vui lòng kiểm tra lại.', 'danger')
+            return redirect(url_for('admin.admin_edit_product', product_id=product_id))
+
+        # Handle file upload for the image (if necessary)
+        # Ảnh mới được xử lý trong job nền, ảnh cũ sẽ được dọn khi job xong
+        if form.image.data:
+            staged_filename = stage_upload(form.image.data)
+            if staged_filename:
+                job_queue.enqueue('process_image', product_id=product.id,
+                                  staged_filename=staged_filename)
+
+        search.index_product(db.session, product)
+        # Commit the changes to the database
+        db.session.commit()
+        # Danh sách sản phẩm liên quan (khác danh mục) đang hiện tên cũ
+        listed_in = copurchase_neighbours(product.id) if product.name != old_name else ()
+        invalidate_product_cache(product.id, old_category_id, product.category_id, listed_in=listed_in)
+        if stock_delta:
+            page_cache.invalidate('stock')
+        flash('Product updated successfully!', 'success')  # Flash a success message
+        return redirect(url_for('admin.admin_products'))  # Redirect to the products list
+
+    return render_template('admin/product_form.html', form=form)
+
+
+@bp.route('/admin/product/delete/<int:product_id>', methods=['POST'])
+@admin_required
+def admin_delete_product(product_id):
+    product = Product.query.get_or_404(product_id)
+    if product.image_url:
+        job_queue.enqueue('delete_image', image_url=product.image_url)
+    product_id, category_id = product.id, product.category_id
+    listed_in = copurchase_neighbours(product_id)
+    search.remove_product(db.session, product.id)
+    if product.stock:
+        inventory.record(product_id, -product.stock, 0, 'removed')
+    db.session.execute(delete(LowStockProduct).where(LowStockProduct.product_id == product_id))
+    db.session.execute(delete(ProductPair).where(db.or_(ProductPair.product_id == product_id,
+                                                        ProductPair.other_id == product_id)))
+    db.session.execute(delete(RelatedProducts).where(RelatedProducts.product_id == product_id))
+    increment_metric('products', -1)
+    db.session.delete(product)
+    db.session.commit()
+    pagination.invalidate_counts('products')
+    invalidate_product_cache(product_id, category_id, listed_in=listed_in)
+    flash('Đã xóa sản phẩm!', 'success')
+    return redirect(url_for('admin.admin_products'))
+
+@bp.route('/admin/product/<int:product_id>/inventory')
+@admin_required
+def admin_product_inventory(product_id):
+    # Lịch sử kho, mới nhất trước; trang sau dùng ?before=<id nhỏ nhất của trang trước>
+    movements = inventory.history(product_id, request.args.get('before', type=int),
+                                  min(request.args.get('limit', 100, type=int), 1000))
+    return jsonify([{'id': m.id, 'delta': m.delta, 'stock_after': m.stock_after, 'reason': m.reason,
+                     'order_id': m.order_id, 'user_id': m.user_id, 'created_at': m.created_at.isoformat()}
+                    for m in movements])
+
+@bp.route('/admin/product/delete/<int:product_id>', methods=['GET'])
+@admin_required
+def admin_delete_product_confirm(product_id):
+    product = Product.query.get_or_404(product_id)
+    return render_template('admin/delete_product.html', product=product)
+
+
+@bp.route('/admin/categories')
+@admin_required
+def admin_categories():
+    categories = cached_categories()
+    return render_template('admin/categories.html', categories=categories)
+
+@bp.route('/admin/category/new', methods=['GET', 'POST'])
+@admin_required
+def admin_new_category():
+    if request.method == 'POST':
+        category = Category(
+            name=request.form.get('name'),
+            description=request.form.get('description')
+        )
+        db.session.add(category)
+        db.session.commit()
+        invalidate_category_cache()
+        flash('Thêm danh mục thành công!', 'success')
+        return redirect(url_for('admin.admin_categories'))
+    return render_template('admin/category_form.html')
+
+@bp.route('/admin/category/edit/<int:category_id>', methods=['GET', 'POST'])
+@admin_required
+def admin_edit_category(category_id):
+    category = Category.query.get_or_404(category_id)
+    if request.method == 'POST':
+        category.name = request.form.get('name')
+        category.description = request.form.get('description')
+        db.session.commit()
+        invalidate_category_cache()
+        flash('Cập nhật danh mục thành công!', 'success')
+        return redirect(url_for('admin.admin_categories'))
+    return render_template('admin/category_form.html', category=category)
+
+@bp.route('/admin/category/delete/<int:category_id>', methods=['POST'])
+@admin_required
+def admin_delete_category(category_id):
+    category = Category.query.get_or_404(category_id)
+    if Product.query.filter_by(category_id=category.id).first():
+        flash('Không thể xóa danh mục đang có sản phẩm!', 'danger')
+    else:
+        db.session.delete(category)
+        db.session.commit()
+        invalidate_category_cache()
+        flash('Đã xóa danh mục!', 'success')
+    return redirect(url_for('admin.admin_categories'))
+
+@bp.route('/admin/orders')
+@query_budget(4)
+@admin_required
+def admin_orders():
+    cursor = request.args.get('cursor')
+    status = request.args.get('status')
+    
+    query = Order.query
+    if status:
+        query = query.filter_by(status=status)
+        
+    total = pagination.estimated_count(f'orders:{status or ""}', query)
+    orders = pagination.keyset_paginate(query.options(joinedload(Order.user)),
+                                        Order, 20, cursor, total=total)
+    return render_template('admin/orders.html', orders=orders, status=status)
+
+
+@bp.route('/admin/orders/export.<fmt>')
+@admin_required
+def admin_export_orders(fmt):
+    if fmt not in ('csv', 'jsonl'):
+        abort(404)
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        abort(400)
+    rows = order_export_rows(request.args.get('status'), start, end)
+    if fmt == 'csv':
+        body, mimetype = export.csv_lines(rows), 'text/csv'
+    else:
+        body, mimetype = export.jsonl_orders(rows), 'application/x-ndjson'
+    filename = f"orders-{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@bp.route('/admin/order/<int:order_id>')
+@query_budget(4)
+@admin_required
+def admin_order_detail(order_id):
+    order = Order.query.options(joinedload(Order.user),
+                                selectinload(Order.items).joinedload(OrderItem.product))\
+        .get_or_404(order_id)
+    return render_template('admin/order_detail.html', order=order)
+
+@bp.route('/admin/order/status/<int:order_id>', methods=['POST'])
+@admin_required
+def admin_update_order_status(order_id):
+    order = Order.query.get_or_404(order_id)
+    status = request.form.get('status')
+    if status in ['pending', 'confirmed', 'shipping', 'completed', 'cancelled']:
+        previous = order.status
+        if status != previous:
+            # Chỉ chuyển trạng thái nếu đơn vẫn ở trạng thái vừa đọc: hai lần hủy cùng lúc
+            # thì chỉ một lần được trừ doanh số và trả hàng về kho
+            changed = db.session.execute(
+                update(Order).where(Order.id == order_id, Order.status == previous)
+                .values(status=status, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if changed != 1:
+                db.session.rollback()
+                flash('Đơn hàng vừa được cập nhật bởi người khác, vui lòng thử lại.', 'danger')
+                return redirect(url_for('admin.admin_order_detail', order_id=order_id))
+        # Hủy đơn thì trừ doanh số và trả hàng về kho; mở lại đơn đã hủy thì làm ngược lại
+        restock = 0
+        if status == 'cancelled' and previous != 'cancelled':
+            lines = order_lines(order.id)
+            record_sale(order, lines, sign=-1, cancelled=1)
+            job_queue.enqueue('update_recommendations', order_id=order.id)
+            restock = 1
+        elif status != 'cancelled' and previous == 'cancelled':
+            lines = order_lines(order.id)
+            record_sale(order, lines, sign=1, cancelled=-1)
+            job_queue.enqueue('update_recommendations', order_id=order.id)
+            restock = -1
+        if restock:
+            reason = 'cancel_restock' if restock > 0 else 'reopen'
+            existing = {pid for pid, in db.session.query(Product.id)
+                        .filter(Product.id.in_({line.product_id for line in lines}))}
+            # Theo thứ tự product_id như khi đặt hàng; bỏ qua sản phẩm đã bị xóa
+            for line in sorted(lines, key=lambda line: line.product_id):
+                if line.product_id not in existing:
+                    continue
+                if not inventory.adjust_stock(line.product_id, restock * line.quantity, reason, order.id):
+                    db.session.rollback()
+                    flash(f'Không đủ hàng trong kho để mở lại đơn (sản phẩm #{line.product_id})!', 'danger')
+                    return redirect(url_for('admin.admin_order_detail', order_id=order_id))
+        db.session.commit()
+        if restock:
+            page_cache.invalidate('stock')
+        flash('Cập nhật trạng thái đơn hàng thành công!', 'success')
+    return redirect(url_for('admin.admin_order_detail', order_id=order_id))
+
+def daily_sales(start_day, end_day):
+    return DailySales.query.filter(DailySales.day.between(start_day, end_day))\
+        .order_by(DailySales.day).all()
+
+def top_products(limit):
+    return db.session.query(ProductSales, Product.name)\
+        .outerjoin(Product, Product.id == ProductSales.product_id)\
+        .order_by(ProductSales.revenue.desc()).limit(limit).all()
+
+def category_sales():
+    return db.session.query(CategorySales, Category.name)\
+        .outerjoin(Category, Category.id == CategorySales.category_id)\
+        .order_by(CategorySales.revenue.desc()).all()
+
+@bp.route('/admin/reports')
+@query_budget(4)
+@admin_required
+def admin_reports():
+    start_day, end_day = analytics.parse_range(request.args.get('start'), request.args.get('end'))
+    return render_template('admin/reports.html', start_day=start_day, end_day=end_day,
+                           daily=daily_sales(start_day, end_day),
+                           top_products=top_products(min(request.args.get('limit', 10, type=int), 1000)),
+                           categories=category_sales())
+
+@bp.route('/admin/reports/daily.json')
+@admin_required
+def admin_report_daily():
+    start_day, end_day = analytics.parse_range(request.args.get('start'), request.args.get('end'))
+    return jsonify([{'day': r.day.isoformat(), 'orders': r.orders, 'units': r.units,
+                     'revenue': r.revenue, 'cancelled': r.cancelled}
+                    for r in daily_sales(start_day, end_day)])
+
+@bp.route('/admin/reports/products.json')
+@admin_required
+def admin_report_products():
+    limit = min(request.args.get('limit', 20, type=int), 1000)
+    return jsonify([{'product_id': r.product_id, 'name': name, 'units': r.units, 'revenue': r.revenue}
+                    for r, name in top_products(limit)])
+
+@bp.route('/admin/reports/categories.json')
+@admin_required
+def admin_report_categories():
+    return jsonify([{'category_id': r.category_id, 'name': name, 'units': r.units, 'revenue': r.revenue}
+                    for r, name in category_sales()])
+
+@bp.route('/admin/cache')
+@admin_required
+def admin_cache_stats():
+    return jsonify({'catalog': catalog_cache.stats(), 'pages': page_cache.stats()})
+
+@bp.route('/metrics')
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif not current_user.is_authenticated or not current_user.is_admin:
+        # Chưa đặt token thì chỉ admin đã đăng nhập xem được (số liệu lộ lưu lượng, SQL của từng route)
+        abort(404)
+    extra = {
+        'catalog_cache_entries': catalog_cache.stats()['size'],
+        'page_cache_entries': page_cache.stats()['size'],
+    }
+    return Response(profiling.render_metrics(extra), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/admin/profile')
+@admin_required
+def admin_profile():
+    """Collapsed stacks from the sampling profiler (feed to flamegraph.pl / speedscope)"""
+    profiler = current_app.extensions.get('profiler')
+    if profiler is None or not current_app.config['PROFILER_ENABLED']:
+        return Response('Profiler is off; set PROFILER_ENABLED=1\n', status=404, mimetype='text/plain')
+    body = profiler.collapsed(limit=request.args.get('limit', type=int))
+    if request.args.get('reset'):
+        profiler.reset()
+    return Response(body, mimetype='text/plain')
+
+@bp.route('/admin/slow-queries')
+@admin_required
+def admin_slow_queries():
+    return jsonify(profiling.registry.slowest_statements())
+
+@bp.route('/admin/jobs')
+@admin_required
+def admin_jobs():
+    status = request.args.get('status')
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    recent = query.order_by(Job.id.desc()).limit(50).all()
+    return jsonify([jobs.job_status(job) for job in recent])
+
+@bp.route('/admin/jobs/<int:job_id>')
+@admin_required
+def admin_job_status(job_id):
+    return jsonify(jobs.job_status(Job.query.get_or_404(job_id)))
+
@@ -0,0 +1,179 @@
+"""
+Cart, checkout and order history blueprint.
+"""
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import delete
+from sqlalchemy.orm import joinedload, selectinload
+
+import dbconfig
+import pagination
+from cart import (CartError, apply_cart_changes, apply_guest_cart_changes, cart_lines, cart_payload,
+                  cart_totals, guest_cart_lines)
+from extensions import db, login_manager, page_cache
+from models import CartItem, Order, OrderItem, Product
+from orders import OutOfStock, place_order, reserve_cart
+from querycount import query_budget
+
+bp = Blueprint('checkout', __name__)
+
+@bp.route('/api/cart', methods=['GET', 'POST'])
+@dbconfig.use_primary
+def api_cart():
+    """
+    GET: the cart with totals. POST {"lines": [{"product_id": 1, "quantity": 2},
+    {"product_id": 5, "delta": -1}, ...]} applies every change at once
+    """
+    if not current_user.is_authenticated and not current_app.config['GUEST_CARTS']:
+        return jsonify({'error': 'Login required'}), 401
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            if current_user.is_authenticated:
+                apply_cart_changes(current_user.id, data.get('lines'))
+            else:
+                apply_guest_cart_changes(data.get('lines'))
+        except CartError as e:
+            return jsonify({'errors': e.errors}), 409
+    return jsonify(cart_payload())
+
+@bp.route('/cart/add/<int:product_id>', methods=['POST'])
+def add_to_cart(product_id):
+    if not current_user.is_authenticated and not current_app.config['GUEST_CARTS']:
+        return login_manager.unauthorized()
+    # Form chỉ thêm hàng; bớt hoặc bỏ dòng đi qua /cart/update hoặc delta âm của /api/cart
+    try:
+        quantity = int(request.form.get('quantity', 1))
+        if quantity < 1:
+            raise ValueError
+    except ValueError:
+        flash('Số lượng không hợp lệ', 'danger')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    change = {'product_id': product_id, 'delta': quantity}
+    try:
+        if current_user.is_authenticated:
+            apply_cart_changes(current_user.id, [change])
+        else:
+            apply_guest_cart_changes([change])
+    except CartError as e:
+        flash(e.errors[0]['error'], 'danger')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    flash('Đã thêm vào giỏ hàng!', 'success')
+    return redirect(url_for('storefront.product_detail', product_id=product_id))
+
+@bp.route('/cart')
+@query_budget(2)
+def view_cart():
+    if current_user.is_authenticated:
+        cart_items = cart_lines(current_user.id)
+    elif current_app.config['GUEST_CARTS']:
+        cart_items = guest_cart_lines()
+    else:
+        return login_manager.unauthorized()
+    # Các dòng đã có sẵn nên cộng luôn ở đây thay vì thêm một câu SQL
+    total = sum(item.unit_price * item.quantity for item in cart_items)
+    return render_template('cart.html', cart_items=cart_items, total=total)
+
+@bp.route('/cart/update/<int:item_id>', methods=['POST'])
+@query_budget(6)
+@login_required
+def update_cart(item_id):
+    user_id = current_user.id
+    cart_item = CartItem.query.options(joinedload(CartItem.product)).get_or_404(item_id)
+    if cart_item.user_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    unit_price = cart_item.product.unit_price
+    try:
+        quantity = int(request.form.get('quantity'))
+        apply_cart_changes(user_id, [{'product_id': cart_item.product_id, 'quantity': quantity}])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Số lượng không hợp lệ'}), 400
+    except CartError as e:
+        return jsonify({'error': e.errors[0]['error']}), 400
+    return jsonify({
+        'message': 'Updated successfully',
+        'subtotal': unit_price * quantity,
+        'total': cart_totals(user_id)['total']
+    })
+
+@bp.route('/cart/remove/<int:item_id>')
+def remove_from_cart(item_id):
+    if current_user.is_authenticated:
+        db.session.execute(delete(CartItem).where(CartItem.id == item_id, CartItem.user_id == current_user.id)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+    elif current_app.config['GUEST_CARTS']:
+        # Với giỏ của khách, item_id là product_id
+        cart = dict(session.get('cart') or {})
+        cart.pop(str(item_id), None)
+        session['cart'] = cart
+    else:
+        return login_manager.unauthorized()
+    return redirect(url_for('checkout.view_cart'))
+
+def _drop_unavailable(user_id, product_ids):
+    """Remove cart lines whose product has been deleted"""
+    db.session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.product_id.in_(product_ids))
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    flash('Một số sản phẩm trong giỏ không còn bán nữa và đã được bỏ khỏi giỏ hàng!', 'danger')
+
+@bp.route('/checkout', methods=['GET', 'POST'])
+@login_required
+@dbconfig.use_primary
+def checkout():
+    user_id = current_user.id
+    cart_items = CartItem.query.options(joinedload(CartItem.product))\
+        .filter_by(user_id=user_id).all()
+    unavailable = [item.product_id for item in cart_items if item.product is None]
+    if unavailable:
+        _drop_unavailable(user_id, unavailable)
+        return redirect(url_for('checkout.view_cart'))
+    if not cart_items:
+        flash('Giỏ hàng trống!', 'danger')
+        return redirect(url_for('checkout.view_cart'))
+        
+    if request.method == 'POST':
+        try:
+            place_order(user_id, cart_items,
+                        shipping_address=request.form.get('address'),
+                        phone=request.form.get('phone'),
+                        note=request.form.get('note'))
+        except OutOfStock as e:
+            product = db.session.get(Product, e.product_id)
+            if product is None:
+                # Sản phẩm bị xóa trong lúc đặt hàng
+                _drop_unavailable(user_id, [e.product_id])
+                return redirect(url_for('checkout.view_cart'))
+            flash(f'Sản phẩm {product.name} chỉ còn {product.stock} trong kho!', 'danger')
+            return redirect(url_for('checkout.checkout'))
+        page_cache.invalidate('stock')
+        flash('Đặt hàng thành công!', 'success')
+        return redirect(url_for('checkout.view_orders'))
+
+    if current_app.config['STOCK_RESERVATION_MINUTES']:
+        if reserve_cart(user_id, cart_items, current_app.config['STOCK_RESERVATION_MINUTES']):
+            db.session.commit()
+            page_cache.invalidate('stock')
+    total = sum(item.product.unit_price * item.quantity for item in cart_items)
+    return render_template('checkout.html', cart_items=cart_items, total=total)
+
+@bp.route('/orders')
+@query_budget(4)
+@login_required
+def view_orders():
+    # Chỉ đọc một trang đơn hàng với phần tóm tắt lưu sẵn; dòng hàng chi tiết xem ở order_detail
+    orders = pagination.keyset_paginate(Order.query.filter_by(user_id=current_user.id), Order, 20,
+                                        request.args.get('cursor'))
+    return render_template('orders.html', orders=orders)
+
+@bp.route('/order/<int:order_id>')
+@query_budget(4)
+@login_required
+def order_detail(order_id):
+    order = Order.query.options(selectinload(Order.items).joinedload(OrderItem.product))\
+        .get_or_404(order_id)
+    if order.user_id != current_user.id and not current_user.is_admin:
+        flash('Bạn không có quyền xem đơn hàng này!', 'danger')
+        return redirect(url_for('checkout.view_orders'))
+    return render_template('order_detail.html', order=order)
@@ -0,0 +1,214 @@
+"""
+Storefront blueprint: catalogue pages and accounts.
+"""
+import math
+
+from flask import (Blueprint, abort, current_app, flash, make_response, redirect, render_template,
+                   request, url_for)
+from flask_login import current_user, login_required, login_user, logout_user
+
+import images
+import pagecache
+import pagination
+import passwords
+import profiling
+import search
+from cart import merge_guest_cart
+from catalog import cached_categories, cached_product, cached_related_products
+from extensions import db, login_limiter, login_manager, page_cache, password_hasher
+from models import Product, User, increment_metric
+from querycount import query_budget
+
+bp = Blueprint('storefront', __name__)
+
+@bp.app_template_global()
+def image_url_for(image_url, variant='card', fmt='jpg'):
+    return url_for('static', filename=images.image_path(image_url, variant, fmt))
+
+@bp.app_template_global()
+def image_srcset(image_url, fmt='jpg'):
+    return images.image_srcset(image_url, fmt, url_for=lambda path: url_for('static', filename=path))
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
+
+# Routes cho người dùng
+@bp.route('/')
+@query_budget(4)
+@pagecache.cached_page(page_cache)
+def index():
+    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
+    per_page = 12  # Số sản phẩm mỗi trang
+    categories = cached_categories()
+    category_id = request.args.get('category', type=int)
+    search_query = request.args.get('search', '')
+    
+    products_query = Product.query
+    if category_id:
+        products_query = products_query.filter_by(category_id=category_id)
+    if search_query:
+        # Kết quả tìm kiếm sắp theo độ liên quan nên vẫn phân trang theo số trang
+        products_query = search.apply_search(products_query, Product, search_query)
+        products = products_query.paginate(page=page, per_page=per_page, error_out=False)
+        next_url = url_for('storefront.index', page=products.next_num, category=category_id,
+                           search=search_query) if products.has_next else None
+        prev_url = url_for('storefront.index', page=products.prev_num, category=category_id,
+                           search=search_query) if products.has_prev else None
+    else:
+        products = pagination.keyset_paginate(products_query, Product, per_page, cursor)
+        next_url = url_for('storefront.index', cursor=products.next_cursor,
+                           category=category_id) if products.has_next else None
+        prev_url = url_for('storefront.index', cursor=products.prev_cursor,
+                           category=category_id) if products.has_prev else None
+    # Lưới sản phẩm khác nhau theo loại người xem; khách hàng thấy cả tồn kho
+    if not current_user.is_authenticated:
+        viewer, groups = 'anonymous', ('catalog',)
+    elif current_user.is_admin:
+        viewer, groups = 'admin', ('catalog',)
+    else:
+        viewer, groups = 'customer', ('catalog', 'stock')
+    product_grid = pagecache.render_fragment(
+        page_cache, f'grid-{viewer}', groups,
+        lambda: render_template('product_grid.html', products=products))
+    return render_template('index.html', products=products, categories=categories,
+                           product_grid=product_grid, next_url=next_url, prev_url=prev_url)
+
+@bp.route('/product/<int:product_id>')
+@query_budget(4)
+@pagecache.cached_page(page_cache)
+def product_detail(product_id):
+    product = cached_product(product_id)
+    if product is None:
+        abort(404)
+    related_products = cached_related_products(product)
+    return render_template('product_detail.html', product=product, related_products=related_products)
+
+def throttle_login(username=None):
+    """
+    Take a login attempt from the client's IP bucket (and the username's, if given)
+    Returns:
+        0 if the attempt may go ahead, otherwise seconds until it may be retried
+    """
+    waits = [login_limiter.consume(f'ip:{request.remote_addr}', current_app.config['LOGIN_ATTEMPTS_PER_IP'], 60)]
+    if username:
+        waits.append(login_limiter.consume(f'user:{username.lower()}',
+                                           current_app.config['LOGIN_ATTEMPTS_PER_USERNAME'], 60))
+    return max(waits)
+
+def too_many_attempts(wait, template):
+    flash(f'Bạn đã thử quá nhiều lần. Vui lòng thử lại sau {math.ceil(wait)} giây.', 'danger')
+    response = make_response(render_template(template), 429)
+    response.headers['Retry-After'] = str(math.ceil(wait))
+    return response
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        if password != confirm_password:
+            flash('Mật khẩu không khớp!', 'danger')
+            return redirect(url_for('storefront.register'))
+
+        wait = throttle_login()
+        if wait:
+            return too_many_attempts(wait, 'register.html')
+        
+        if User.query.filter_by(username=username).first():
+            flash('Tên đăng nhập đã tồn tại!', 'danger')
+            return redirect(url_for('storefront.register'))
+            
+        if User.query.filter_by(email=email).first():
+            flash('Email đã được sử dụng!', 'danger')
+            return redirect(url_for('storefront.register'))
+        
+        try:
+            with profiling.timed('auth'):
+                hashed_password = password_hasher.hash(password)
+        except passwords.HasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'danger')
+            return redirect(url_for('storefront.register'))
+        new_user = User(
+            username=username,
+            email=email,
+            password=hashed_password,
+            full_name=request.form.get('full_name'),
+            address=request.form.get('address'),
+            phone=request.form.get('phone')
+        )
+        db.session.add(new_user)
+        increment_metric('users')
+        db.session.commit()
+        flash('Đăng ký thành công! Vui lòng đăng nhập.', 'success')
+        return redirect(url_for('storefront.login'))
+    return render_template('register.html')
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        # Chặn trước khi băm để dò mật khẩu hàng loạt không chiếm hết CPU
+        wait = throttle_login(username)
+        if wait:
+            return too_many_attempts(wait, 'login.html')
+        user = User.query.filter_by(username=username).first()
+
+        try:
+            with profiling.timed('auth'):
+                valid = user is not None and password_hasher.verify(user.password, password)
+                if valid and password_hasher.needs_rehash(user.password):
+                    user.password = password_hasher.hash(password)
+                    db.session.commit()
+        except passwords.HasherBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'danger')
+            return make_response(render_template('login.html'), 503)
+        if valid:
+            login_limiter.reset(f'user:{username.lower()}')
+            login_user(user)
+            merge_guest_cart(user.id)
+            next_page = request.args.get('next')
+            return redirect(next_page if next_page else url_for('storefront.index'))
+        flash('Tên đăng nhập hoặc mật khẩu không đúng!', 'danger')
+    return render_template('login.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('storefront.index'))
+
+@bp.route('/profile', methods=['GET', 'POST'])
+@login_required
+def profile():
+    if request.method == 'POST':
+        current_user.full_name = request.form.get('full_name')
+        current_user.email = request.form.get('email')
+        current_user.address = request.form.get('address')
+        current_user.phone = request.form.get('phone')
+        
+        if request.form.get('new_password'):
+            wait = throttle_login(current_user.username)
+            if wait:
+                return too_many_attempts(wait, 'profile.html')
+            try:
+                with profiling.timed('auth'):
+                    valid = password_hasher.verify(current_user.password, request.form.get('current_password'))
+                    if valid:
+                        current_user.password = password_hasher.hash(request.form.get('new_password'))
+            except passwords.HasherBusy:
+                flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'danger')
+                return redirect(url_for('storefront.profile'))
+            if not valid:
+                flash('Mật khẩu hiện tại không đúng!', 'danger')
+                return redirect(url_for('storefront.profile'))
+                
+        db.session.commit()
+        flash('Cập nhật thông tin thành công!', 'success')
+        return redirect(url_for('storefront.profile'))
+    return render_template('profile.html')